@@ -26,6 +26,8 @@ else
     echo "ISO standards file not found, skipping import"
 fi
 
+# Caches are warmed up at service start (gunicorn.conf.py): the media disk is not mounted during the build
+
 # Create superuser if it doesn't exist
 echo "Creating superuser..."
 python create_superuser.py
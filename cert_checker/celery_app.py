@@ -7,6 +7,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cert_checker.settings')
 app = Celery('cert_checker')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.conf.timezone = 'Europe/Moscow'
+app.autodiscover_tasks()
 
 @app.task(bind=True)
 def debug_task(self):
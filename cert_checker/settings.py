@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 from decouple import config
 import dj_database_url
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +43,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'certificates.db_router.PrimaryPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'cert_checker.urls'
@@ -77,6 +79,18 @@ else:
         }
     }
 
+# Реплика для публичных страниц проверки сертификатов (необязательно).
+# Для локальной проверки можно указать копию основной SQLite-базы: sqlite:////path/to/replica.sqlite3
+# (миграции применяются только к основной базе, реплика получает схему через репликацию)
+if 'REPLICA_DATABASE_URL' in os.environ:
+    DATABASES['replica'] = dj_database_url.parse(os.environ.get('REPLICA_DATABASE_URL'))
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['certificates.db_router.PrimaryReplicaRouter']
+
+# Сколько секунд после записи запросы сессии читают из основной базы
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 15))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,8 +122,7 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static_collected'),
 ]
 
-# WhiteNoise configuration for static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Хранилища файлов задаются в STORAGES в конце файла (статика обслуживается через WhiteNoise)
 
 # Media files configuration for Render
 MEDIA_URL = '/media/'
@@ -127,6 +140,23 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', 'info@export-center.ru')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'info@export-center.ru')
 
+# Массовая отправка уведомлений: писем на одно SMTP-соединение, число параллельных
+# соединений и общий лимит частоты (писем в секунду, 0 - без ограничения)
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 50))
+NOTIFICATION_SMTP_WORKERS = int(os.environ.get('NOTIFICATION_SMTP_WORKERS', 1))
+NOTIFICATION_RATE_LIMIT = float(os.environ.get('NOTIFICATION_RATE_LIMIT', 5))
+
+# Очередь уведомлений: размер пачки, число пачек за запуск обработчика, число попыток,
+# базовая задержка повтора (удваивается с каждой попыткой) и время аренды строки
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.environ.get('NOTIFICATION_OUTBOX_BATCH_SIZE', 100))
+NOTIFICATION_OUTBOX_MAX_BATCHES = int(os.environ.get('NOTIFICATION_OUTBOX_MAX_BATCHES', 20))
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+NOTIFICATION_RETRY_BASE_SECONDS = int(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', 60))
+NOTIFICATION_SEND_LEASE_SECONDS = int(os.environ.get('NOTIFICATION_SEND_LEASE_SECONDS', 600))
+
+# Сводка для администратора: одно письмо за запуск вместо письма на каждое событие
+NOTIFICATION_ADMIN_DIGEST = os.environ.get('NOTIFICATION_ADMIN_DIGEST', 'True').lower() == 'true'
+
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -211,6 +241,44 @@ LOGGING = {
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Кэш: общий Redis, если он есть, иначе память процесса
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Качество WebP-превью изображений (certificates.thumbnails)
+THUMBNAIL_WEBP_QUALITY = int(os.environ.get('THUMBNAIL_WEBP_QUALITY', 80))
+
+# Сжатие PNG сгенерированных документов после генерации (certificates.optimization):
+# уровень zlib, optimize Pillow и палитра с потерями для почти плоских документов
+PNG_OPTIMIZATION_ENABLED = os.environ.get('PNG_OPTIMIZATION_ENABLED', 'True').lower() == 'true'
+PNG_COMPRESS_LEVEL = int(os.environ.get('PNG_COMPRESS_LEVEL', 9))
+PNG_OPTIMIZE = os.environ.get('PNG_OPTIMIZE', 'True').lower() == 'true'
+PNG_QUANTIZE = os.environ.get('PNG_QUANTIZE', 'False').lower() == 'true'
+# Доля пикселей, которую должны покрывать 256 самых частых цветов, чтобы документ считался почти плоским
+PNG_QUANTIZE_COVERAGE = float(os.environ.get('PNG_QUANTIZE_COVERAGE', 0.95))
+
+# Дисковый кэш уменьшенных изображений /media-resize/<ширина>/<путь> (certificates.resize)
+RESIZE_CACHE_DIR = os.environ.get('RESIZE_CACHE_DIR', os.path.join(BASE_DIR, 'resize_cache'))
+RESIZE_CACHE_MAX_BYTES = int(os.environ.get('RESIZE_CACHE_MAX_MB', 512)) * 1024 * 1024
+RESIZE_MAX_WIDTH = int(os.environ.get('RESIZE_MAX_WIDTH', 2400))
+RESIZE_QUALITY = int(os.environ.get('RESIZE_QUALITY', 82))
+
+# Время жизни кэша публичных страниц сертификатов, разрешений и аудитов
+DETAIL_PAGE_CACHE_SECONDS = int(os.environ.get('DETAIL_PAGE_CACHE_SECONDS', 3600))
+# Хост, для которого warm_caches прогревает страницы (по умолчанию первый из ALLOWED_HOSTS)
+WARMUP_HOST = os.environ.get('WARMUP_HOST')
+
 # Celery Configuration (отключаем для Render, так как Redis может быть недоступен)
 if 'REDIS_URL' in os.environ:
     CELERY_BROKER_URL = os.environ.get('REDIS_URL')
@@ -222,4 +290,91 @@ if 'REDIS_URL' in os.environ:
 else:
     # Отключаем Celery если Redis недоступен
     CELERY_TASK_ALWAYS_EAGER = True
-    CELERY_TASK_EAGER_PROPAGATES = True
\ No newline at end of file
+    CELERY_TASK_EAGER_PROPAGATES = True
+
+# Расписание фоновых задач (celery beat). Beat работает только с брокером (REDIS_URL);
+# без него те же задачи запускает по расписанию команда run_maintenance, например из cron:
+#   10 0 * * *  cd /opt/cert_checker && python manage.py run_maintenance
+#   */5 * * * * cd /opt/cert_checker && python manage.py run_maintenance deliver sweep
+# или из планировщика Windows через update_certificates.bat
+CELERY_BEAT_SCHEDULE = {
+    'refresh-certificate-statuses': {
+        'task': 'certificates.tasks.refresh_statuses_task',
+        'schedule': crontab(hour=0, minute=10),
+    },
+    'send-certificate-notifications': {
+        'task': 'certificates.tasks.send_notifications_task',
+        'schedule': crontab(hour=9, minute=0),
+    },
+    'deliver-notifications': {
+        'task': 'certificates.tasks.deliver_notifications_task',
+        'schedule': crontab(minute='*/5'),
+    },
+    'sweep-deleted-files': {
+        'task': 'certificates.tasks.sweep_deleted_files_task',
+        'schedule': crontab(minute='*/10'),
+    },
+    'cleanup-media': {
+        'task': 'certificates.tasks.cleanup_media_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# Размер диапазона id, обрабатываемого одной подзадачей
+MAINTENANCE_CHUNK_SIZE = int(os.environ.get('MAINTENANCE_CHUNK_SIZE', 500))
+# Через сколько секунд отметку 'started' аварийно завершившегося воркера может забрать повторный запуск
+MAINTENANCE_CLAIM_TIMEOUT = int(os.environ.get('MAINTENANCE_CLAIM_TIMEOUT', 3600))
+
+# Хранить сгенерированные документы и QR-коды по SHA-256 содержимого (одинаковые файлы хранятся один раз)
+MEDIA_CONTENT_ADDRESSED = os.environ.get('MEDIA_CONTENT_ADDRESSED', 'False').lower() == 'true'
+
+# Хранилище медиа: 'filesystem' (MEDIA_ROOT) или 's3' (любое S3-совместимое, например MinIO; нужен django-storages)
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'filesystem')
+
+# Скачивание файлов из S3 по подписанной ссылке, минуя Django
+MEDIA_PRESIGNED_DOWNLOADS = os.environ.get('MEDIA_PRESIGNED_DOWNLOADS', 'True').lower() == 'true'
+
+if MEDIA_STORAGE == 's3':
+    MEDIA_BACKEND = 'storages.backends.s3.S3Storage'
+    GENERATED_MEDIA_BACKEND = 'certificates.storage.ContentAddressedS3Storage'
+    MEDIA_STORAGE_OPTIONS = {
+        'bucket_name': os.environ.get('AWS_STORAGE_BUCKET_NAME'),
+        'endpoint_url': os.environ.get('AWS_S3_ENDPOINT_URL'),
+        'region_name': os.environ.get('AWS_S3_REGION_NAME'),
+        'access_key': os.environ.get('AWS_ACCESS_KEY_ID'),
+        'secret_key': os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        'location': os.environ.get('AWS_LOCATION', 'media'),
+        'default_acl': None,
+        # Медиа закрыто: ссылки подписываются и действуют ограниченное время
+        'querystring_auth': True,
+        'querystring_expire': int(os.environ.get('AWS_QUERYSTRING_EXPIRE', 300)),
+        'file_overwrite': False,
+    }
+else:
+    MEDIA_BACKEND = 'django.core.files.storage.FileSystemStorage'
+    GENERATED_MEDIA_BACKEND = 'certificates.storage.ContentAddressedFileSystemStorage'
+    MEDIA_STORAGE_OPTIONS = {}
+
+STORAGES = {
+    'default': {
+        'BACKEND': MEDIA_BACKEND,
+        'OPTIONS': MEDIA_STORAGE_OPTIONS,
+    },
+    # Сгенерированные документы и QR-коды
+    'generated': {
+        'BACKEND': GENERATED_MEDIA_BACKEND if MEDIA_CONTENT_ADDRESSED else MEDIA_BACKEND,
+        'OPTIONS': MEDIA_STORAGE_OPTIONS,
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Фоновое удаление файлов удаленных сертификатов и аудиторов
+MEDIA_GC_BATCH_SIZE = int(os.environ.get('MEDIA_GC_BATCH_SIZE', 200))
+MEDIA_GC_MAX_BATCHES = int(os.environ.get('MEDIA_GC_MAX_BATCHES', 50))
+MEDIA_GC_MAX_ATTEMPTS = int(os.environ.get('MEDIA_GC_MAX_ATTEMPTS', 5))
+
+# Массовый импорт сертификатов: размер пачки INSERT и количество сертификатов в одной задаче генерации документов
+CERTIFICATE_IMPORT_BATCH_SIZE = int(os.environ.get('CERTIFICATE_IMPORT_BATCH_SIZE', 1000))
+RENDER_CHUNK_SIZE = int(os.environ.get('RENDER_CHUNK_SIZE', 20))
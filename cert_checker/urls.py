@@ -19,6 +19,7 @@ from django.contrib.sitemaps.views import sitemap
 from django.views.static import serve
 # Импорт views из приложения certificates
 from certificates import views
+from certificates.db_router import replica_read
 
 # Импорт sitemaps
 try:
@@ -91,7 +92,7 @@ urlpatterns = [
 # Добавляем sitemap только если sitemaps определены
 if sitemaps:
     urlpatterns.append(
-        path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap')
+        path('sitemap.xml', replica_read(sitemap), {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap')
     )
 else:
     # Fallback sitemap
@@ -100,6 +101,10 @@ else:
     )
 
 # Обслуживание файлов
+urlpatterns += [
+    # Уменьшенные копии изображений произвольной ширины (с проверкой доступа и в режиме разработки)
+    path('media-resize/<int:width>/<path:path>', views.resized_media, name='resized_media'),
+]
 if settings.DEBUG:
     # В режиме разработки
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,21 +1,32 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
 from django.utils.html import format_html
 from django.http import HttpResponse
 from django.conf import settings
-from .models import Certificate, ISOStandard, Auditor
+from django.utils import timezone
+from .models import Certificate, ISOStandard, Auditor, MaintenanceRun, NotificationOutbox, PendingFileDeletion, ImportRecord
 from .utils import generate_certificate_image, generate_permission_image, generate_audit_image
 import re
 import os
 import logging
 from django.core.files.base import ContentFile
 from django import forms
-from .forms import CertificateAdminForm
+from .forms import CertificateAdminForm, CertificateImportForm
+from .importers import import_certificates, CERTIFICATE_COLUMNS
+from .thumbnails import is_image, thumbnail_url
+from .optimization import enqueue_optimization
 
 logger = logging.getLogger(__name__)
 def get_file_preview(file):
     if file:
-        if file.name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-            return format_html('<img src="{}" style="max-height: 100px;" />', file.url)
+        if is_image(file.name):
+            # Превью вместо полноразмерного файла; по клику открывается оригинал
+            return format_html(
+                '<a href="{}" target="_blank"><picture>'
+                '<source type="image/webp" srcset="{}">'
+                '<img src="{}" style="max-height: 100px;" /></picture></a>',
+                file.url, thumbnail_url(file, 'small', 'webp'), thumbnail_url(file, 'small'),
+            )
         elif file.name.lower().endswith('.pdf'):
             return format_html('<a href="{}" target="_blank">Просмотреть PDF</a>', file.url)
         elif file.name.lower().endswith('.psd'):
@@ -53,8 +64,12 @@ class CertificateAdmin(admin.ModelAdmin):
                     'first_inspection_status', 'second_inspection_status', 'download_psd_link',
                     'start_date', 'expiry_date', 'notifications_enabled')
     list_filter = ('status', 'iso_standard', 'first_inspection_status', 'second_inspection_status', 'notifications_enabled')
-    search_fields = ('name', 'certificate_number_part', 'inn')
+    search_fields = ('name', 'certificate_number_part', 'full_certificate_number', 'inn')
     date_hierarchy = 'created_at'
+    # Стандарт для столбца iso_standard подгружается тем же запросом, что и строки списка
+    list_select_related = ('iso_standard',)
+    # Без второго COUNT(*) по всей таблице при поиске и фильтрах
+    show_full_result_count = False
     
     def download_psd_link(self, obj):
         if obj.file1_psd:
@@ -106,23 +121,23 @@ class CertificateAdmin(admin.ModelAdmin):
     
         # Удаляем файлы, если отмечены для удаления
         if file1_deleted and obj.file1:
-            obj.file1.delete(save=False)
+            obj._delete_file_if_exists(obj.file1)
             obj.file1 = None
     
         if file1_psd_deleted and obj.file1_psd:
-            obj.file1_psd.delete(save=False)
+            obj._delete_file_if_exists(obj.file1_psd)
             obj.file1_psd = None
     
         if file2_deleted and obj.file2:
-            obj.file2.delete(save=False)
+            obj._delete_file_if_exists(obj.file2)
             obj.file2 = None
     
         if file2_psd_deleted and obj.file2_psd:
-            obj.file2_psd.delete(save=False)
+            obj._delete_file_if_exists(obj.file2_psd)
             obj.file2_psd = None
 
         if file3_deleted and obj.file3:
-            obj.file3.delete(save=False)
+            obj._delete_file_if_exists(obj.file3)
             obj.file3 = None
     
         # Сохраняем модель
@@ -135,6 +150,7 @@ class CertificateAdmin(admin.ModelAdmin):
     def _generate_documents_if_needed(self, obj, form, file1_deleted, file1_psd_deleted, 
                                     file2_deleted, file2_psd_deleted):
         """Генерирует документы только при необходимости"""
+        png_names = (obj.file1.name, obj.file2.name)
         
         # Генерируем сертификат (PNG)
         if not file1_deleted and not obj.file1 and 'file1' not in form.changed_data:
@@ -153,6 +169,8 @@ class CertificateAdmin(admin.ModelAdmin):
             self._generate_permission_psd(obj)
     
         obj.save()
+        if (obj.file1.name, obj.file2.name) != png_names:
+            enqueue_optimization(certificate_ids=[obj.pk])
 
     def _generate_certificate(self, obj):
         """Генерирует PNG сертификат"""
@@ -203,14 +221,13 @@ class CertificateAdmin(admin.ModelAdmin):
         """Сохранение формсета аудиторов с генерацией файлов"""
         instances = formset.save(commit=False)
         
+        # Номера аудита новым аудиторам выдаются одним резервированием
+        form.instance.assign_audit_numbers([instance for instance in instances if not instance.pk])
+        
         for instance in instances:
             if not instance.pk:  # Новый аудитор
                 instance.save()  # Сохраняем для получения ID
                 
-                # Генерируем номер аудита если его нет
-                if not instance.audit_number:
-                    instance.audit_number = form.instance.generate_audit_number()
-                
                 # Генерируем файлы аудита
                 self._generate_audit_files(form.instance, instance)
             
@@ -237,6 +254,7 @@ class CertificateAdmin(admin.ModelAdmin):
                             png_image, 
                             save=False
                         )
+                        enqueue_optimization(auditor_ids=[auditor.pk])
                     
                     if psd_image and not auditor.audit_file_psd:
                         auditor.audit_file_psd.save(
@@ -279,6 +297,11 @@ class CertificateAdmin(admin.ModelAdmin):
         from django.urls import path
         urls = super().get_urls()
         custom_urls = [
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_view),
+                name='certificates_certificate_import',
+            ),
             path(
                 '<int:object_id>/regenerate-qr/',
                 self.admin_site.admin_view(self.regenerate_qr_view),
@@ -287,6 +310,37 @@ class CertificateAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
     
+    def import_view(self, request):
+        """Массовый импорт сертификатов из CSV/XLSX"""
+        from django.shortcuts import redirect, render
+
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        errors = []
+        form = CertificateImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            result = import_certificates(upload, upload.name, dry_run=form.cleaned_data['dry_run'],
+                                         force=form.cleaned_data['force'])
+            errors = result['errors']
+            if result['skipped']:
+                self.message_user(request, 'Этот файл уже импортирован', messages.WARNING)
+            elif not errors and form.cleaned_data['dry_run']:
+                self.message_user(request, f"Проверено строк: {result['rows']}, ошибок нет")
+            elif not errors:
+                self.message_user(request, f"Создано сертификатов: {result['created']}. "
+                                           f"QR-коды и документы генерируются в фоне")
+                return redirect('admin:certificates_certificate_changelist')
+
+        return render(request, 'admin/certificates/certificate/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Импорт сертификатов',
+            'form': form,
+            'errors': errors,
+            'columns': [(column, required) for column, (field, required) in CERTIFICATE_COLUMNS.items()],
+        })
+
     def regenerate_qr_view(self, request, object_id):
         """Представление для регенерации QR-кода"""
         from django.http import JsonResponse
@@ -395,6 +449,47 @@ class ISOStandardAdmin(admin.ModelAdmin):
     search_fields = ('standard_name', 'description')
     ordering = ('standard_name',)
 
+@admin.register(MaintenanceRun)
+class MaintenanceRunAdmin(admin.ModelAdmin):
+    """Журнал фоновых задач; удаление записи позволяет повторно обработать диапазон"""
+    list_display = ('task_name', 'run_date', 'chunk_start', 'chunk_end', 'status', 'result', 'started_at', 'finished_at')
+    list_filter = ('task_name', 'status', 'run_date')
+    readonly_fields = ('task_name', 'run_date', 'chunk_start', 'chunk_end', 'status', 'result', 'started_at', 'finished_at')
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('notification_type', 'recipient_type', 'recipient', 'certificate', 'status',
+                    'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'notification_type', 'recipient_type')
+    search_fields = ('recipient', 'subject', 'dedup_key')
+    list_select_related = ('certificate',)
+    readonly_fields = ('certificate', 'recipient_type', 'notification_type', 'from_email', 'recipient', 'subject',
+                       'body', 'dedup_key', 'status', 'attempts', 'next_attempt_at', 'last_error',
+                       'created_at', 'sent_at')
+    actions = ['retry_notifications']
+
+    def retry_notifications(self, request, queryset):
+        """Возвращает недоставленные уведомления в очередь"""
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f"Возвращено в очередь: {updated}")
+    retry_notifications.short_description = "Повторить отправку"
+
+@admin.register(ImportRecord)
+class ImportRecordAdmin(admin.ModelAdmin):
+    """Журнал импорта справочников; удаление записи заставит следующий импорт выполниться заново"""
+    list_display = ('kind', 'file_name', 'rows', 'created', 'updated', 'unchanged', 'errors', 'imported_at')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'file_name', 'file_hash', 'rows', 'created', 'updated', 'unchanged', 'errors', 'imported_at')
+
+@admin.register(PendingFileDeletion)
+class PendingFileDeletionAdmin(admin.ModelAdmin):
+    """Очередь фонового удаления файлов"""
+    list_display = ('name', 'attempts', 'last_error', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'attempts', 'last_error', 'created_at')
+
 class AuditorAdminForm(forms.ModelForm):
     clear_audit_file = forms.BooleanField(required=False, label='Очистить файл аудита')
     clear_audit_file_psd = forms.BooleanField(required=False, label='Очистить файл аудита (PSD)')
@@ -410,6 +505,10 @@ class AuditorAdmin(admin.ModelAdmin):
     list_filter = ('certificate__iso_standard', 'certificate__status')
     search_fields = ('full_name', 'certificate__name', 'certificate__certificate_number_part')
     readonly_fields = ('audit_file_preview', 'audit_number')
+    # Auditor.__str__ (столбец и подпись чекбокса действий) читает сертификат; явный JOIN
+    # не пропадет, если столбец certificate уберут из list_display
+    list_select_related = ('certificate',)
+    show_full_result_count = False
     
     fieldsets = (
         ('Основная информация', {
@@ -430,11 +529,11 @@ class AuditorAdmin(admin.ModelAdmin):
         """Сохранение модели аудитора с обработкой очистки файлов"""
         # Обрабатываем очистку файлов
         if form.cleaned_data.get('clear_audit_file') and obj.audit_file:
-            obj.audit_file.delete(save=False)
+            obj._delete_file_if_exists(obj.audit_file)
             obj.audit_file = None
             
         if form.cleaned_data.get('clear_audit_file_psd') and obj.audit_file_psd:
-            obj.audit_file_psd.delete(save=False)
+            obj._delete_file_if_exists(obj.audit_file_psd)
             obj.audit_file_psd = None
 
         # Генерируем номер аудита если его нет
@@ -461,6 +560,7 @@ class AuditorAdmin(admin.ModelAdmin):
                         png_image,
                         save=False
                     )
+                    enqueue_optimization(auditor_ids=[auditor.pk])
                 
                 if psd_image and not auditor.audit_file_psd:
                     auditor.audit_file_psd.save(
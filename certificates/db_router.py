@@ -0,0 +1,79 @@
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE_NAME = 'db_pin_primary'
+
+# Флаг устанавливается только на время публичных представлений, помеченных @replica_read
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_available():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """
+    Направляет чтения публичных страниц на реплику, все записи и остальные чтения - на основную базу.
+
+    Если реплика не настроена, все запросы идут в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_available():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def replica_read(view_func):
+    """
+    Декоратор для публичных представлений только на чтение.
+
+    Запросы с cookie закрепления (выставляется после записи) читают из основной базы,
+    чтобы администратор сразу видел свои изменения, несмотря на отставание реплики.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.COOKIES.get(PIN_COOKIE_NAME):
+            return view_func(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class PrimaryPinningMiddleware:
+    """Закрепляет сессию за основной базой на REPLICA_PIN_SECONDS после запроса с записью"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and replica_available():
+            response.set_cookie(
+                PIN_COOKIE_NAME, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
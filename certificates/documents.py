@@ -0,0 +1,52 @@
+"""
+Изображения заполненных документов для публичных страниц.
+
+Страницы сертификата, разрешения и аудита показывают готовый PNG вместо
+разбора PSD-шаблона в браузере. Это файлы file1, file2 и audit_file: их
+создают функции generate_*_image при сохранении в админке или фоновая
+генерация, а сжимает certificates.optimization.
+
+Запрос страницы документ никогда не рендерит. Генерация ставится в очередь,
+только если есть брокер (без него задача выполнилась бы прямо в запросе) и
+документ ни разу не создавался: пустой PNG при сохраненном PSD означает, что
+файл удалили в админке, и он не восстанавливается.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from .tasks import render_documents_task, render_audit_documents_task
+
+# Вид документа -> поля с PNG и PSD
+DOCUMENT_FIELDS = {
+    'certificate': ('file1', 'file1_psd'),
+    'permission': ('file2', 'file2_psd'),
+    'audit': ('audit_file', 'audit_file_psd'),
+}
+
+# Сколько секунд повторные запросы не ставят генерацию того же документа в очередь
+RENDER_RETRY_SECONDS = 300
+
+
+def has_broker():
+    """Задачи Celery уходят воркеру, а не выполняются в текущем процессе"""
+    return bool(getattr(settings, 'CELERY_BROKER_URL', None)) and not getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False)
+
+
+def document_file(kind, certificate, auditor=None):
+    """
+    Файл документа kind ('certificate', 'permission' или 'audit') или None, если его нет.
+
+    Для ни разу не созданного документа генерация ставится в очередь воркеру
+    не чаще раза в RENDER_RETRY_SECONDS.
+    """
+    instance = auditor if kind == 'audit' else certificate
+    png_field, psd_field = DOCUMENT_FIELDS[kind]
+    if getattr(instance, png_field):
+        return getattr(instance, png_field)
+
+    if (not getattr(instance, psd_field) and has_broker()
+            and cache.add(f'document_render:{kind}:{instance.pk}', 1, RENDER_RETRY_SECONDS)):
+        if kind == 'audit':
+            render_audit_documents_task.delay([instance.pk])
+        else:
+            render_documents_task.delay([instance.pk])
+    return None
@@ -1,4 +1,3 @@
-from django.db.models import Max
 from django import forms
 from django.forms import inlineformset_factory
 from .models import Certificate, Auditor, ISOStandard
@@ -48,14 +47,21 @@ class CertificateForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if self.instance.iso_standard:
+        if self.instance.iso_standard_id:
             self.fields['iso_standard_name'].initial = self.instance.iso_standard.certificate_standard_name
         
         if not self.instance.pk:
-            self.fields['certificate_number_part'].initial = self.get_next_number()
+            # Номер не подставляется в поле: при одновременном создании он мог бы достаться двоим,
+            # поэтому пустое поле означает выдачу номера счетчиком при сохранении
+            self.fields['certificate_number_part'].widget.attrs['placeholder'] = (
+                f"{self.get_next_number()} (присваивается автоматически)"
+            )
 
     def clean_certificate_number_part(self):
         part = self.cleaned_data['certificate_number_part']
+        # Пустой номер допустим только у нового сертификата: его выдаст счетчик при сохранении
+        if not part and not self.instance.pk:
+            return part
         if not part.isdigit() or len(part) != 5:
             raise forms.ValidationError("Номер сертификата должен состоять из 5 цифр")
         
@@ -66,11 +72,7 @@ class CertificateForm(forms.ModelForm):
         return part
 
     def get_next_number(self):
-        max_number = Certificate.objects.aggregate(Max('certificate_number_part'))['certificate_number_part__max']
-        if max_number:
-            return f"{int(max_number) + 1:05d}"
-        else:
-            return "01001"
+        return Certificate.get_next_number()
 
     def clean(self):
         cleaned_data = super().clean()
@@ -108,6 +110,17 @@ class AuditorForm(forms.ModelForm):
             self.add_error('audit_file_psd', 'Нельзя одновременно загрузить новый PSD файл и очистить существующий')
         return cleaned_data
 
+class CertificateImportForm(forms.Form):
+    file = forms.FileField(label='Файл CSV или XLSX')
+    dry_run = forms.BooleanField(required=False, label='Только проверить, ничего не создавая')
+    force = forms.BooleanField(required=False, label='Импортировать, даже если этот файл уже загружался')
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            raise forms.ValidationError('Поддерживаются только файлы CSV и XLSX')
+        return file
+
 AuditorFormSet = inlineformset_factory(
     Certificate, 
     Auditor, 
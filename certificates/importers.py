@@ -0,0 +1,229 @@
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from .models import Certificate, ISOStandard, NumberSequence, ImportRecord
+from .tasks import render_documents_task
+import csv
+import hashlib
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMPORT_KIND = 'certificates'
+
+# Столбец файла -> поле модели; обязательные столбцы отмечены True
+CERTIFICATE_COLUMNS = {
+    'Наименование организации': ('name', True),
+    'ИНН организации': ('inn', True),
+    'Адрес организации': ('address', True),
+    'Номер сертификата': ('certificate_number_part', False),
+    'Стандарт ИСО': ('iso_standard', True),
+    'Система менеджмента качества': ('quality_management_system', True),
+    'Дата начала действия': ('start_date', True),
+    'Дата окончания действия': ('expiry_date', False),
+    'Срок действия': ('validity_period', False),
+    'Область сертификации': ('certification_area', True),
+    'Email клиента': ('client_email', False),
+    'Уведомления подключены': ('notifications_enabled', False),
+}
+
+DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d', '%d/%m/%Y')
+TRUE_VALUES = {'да', 'yes', 'true', '1', '+'}
+
+
+def file_sha256(file):
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: file.read(1024 * 1024), b''):
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Excel хранит ИНН и номера как числа
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'некорректная дата "{text}"')
+
+
+def read_rows(file, filename):
+    """Потоково читает строки CSV или XLSX; первая строка - заголовок"""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            sample = text.read(4096)
+            text.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample else csv.excel
+            yield from csv.reader(text, dialect)
+        finally:
+            # Файл закрывает вызывающий код
+            text.detach()
+
+
+class CertificateRowError(Exception):
+    pass
+
+
+def _build_certificate(values, standards):
+    """Проверяет значения строки и создает несохраненный Certificate"""
+    for column, (field, required) in CERTIFICATE_COLUMNS.items():
+        if required and not _text(values.get(field)):
+            raise CertificateRowError(f'не заполнен столбец "{column}"')
+
+    standard = standards.get(_text(values['iso_standard']))
+    if standard is None:
+        raise CertificateRowError(f'неизвестный стандарт "{_text(values["iso_standard"])}"')
+
+    number = _text(values.get('certificate_number_part'))
+    if number and (not number.isdigit() or len(number) != 5):
+        raise CertificateRowError('номер сертификата должен состоять из 5 цифр')
+
+    try:
+        start_date = _parse_date(values['start_date'])
+        validity = int(_text(values.get('validity_period')) or Certificate._meta.get_field('validity_period').default)
+        expiry_date = (_parse_date(values['expiry_date']) if _text(values.get('expiry_date'))
+                       else start_date + relativedelta(years=validity))
+    except ValueError as e:
+        raise CertificateRowError(str(e))
+
+    client_email = _text(values.get('client_email')) or None
+    if client_email:
+        try:
+            validate_email(client_email)
+        except ValidationError:
+            raise CertificateRowError(f'некорректный email "{client_email}"')
+
+    certificate = Certificate(
+        name=_text(values['name']), inn=_text(values['inn']), address=_text(values['address']),
+        certificate_number_part=number, iso_standard=standard,
+        quality_management_system=_text(values['quality_management_system']),
+        start_date=start_date, expiry_date=expiry_date, validity_period=validity,
+        certification_area=_text(values['certification_area']), client_email=client_email,
+        notifications_enabled=_text(values.get('notifications_enabled')).lower() in TRUE_VALUES,
+    )
+    for field in ('name', 'inn'):
+        limit = Certificate._meta.get_field(field).max_length
+        if len(getattr(certificate, field)) > limit:
+            raise CertificateRowError(f'значение поля {field} длиннее {limit} символов')
+    return certificate
+
+
+def import_certificates(file, filename, dry_run=False, force=False, render=True, batch_size=None):
+    """
+    Массовый импорт сертификатов из CSV/XLSX.
+
+    Все строки проверяются до записи; при наличии ошибок ничего не создается.
+    Стандарты ISO берутся из словаря в памяти, номера без указанного значения
+    выдаются одним блоком, сертификаты вставляются bulk_create пачками.
+    QR-коды и документы генерируются фоновыми задачами после фиксации транзакции.
+    Возвращает словарь: rows, created, errors (список пар (строка, сообщение)), skipped.
+    """
+    batch_size = batch_size or getattr(settings, 'CERTIFICATE_IMPORT_BATCH_SIZE', 1000)
+    result = {'rows': 0, 'created': 0, 'errors': [], 'skipped': False}
+
+    file_hash = file_sha256(file)
+    if not force and ImportRecord.last_hash(IMPORT_KIND) == file_hash:
+        result['skipped'] = True
+        return result
+
+    rows = read_rows(file, filename)
+    header = [_text(value) for value in next(rows, ())]
+    missing = [column for column, (field, required) in CERTIFICATE_COLUMNS.items() if required and column not in header]
+    if missing:
+        rows.close()
+        result['errors'].append((1, f'В файле отсутствуют столбцы {missing}'))
+        return result
+    positions = {field: header.index(column) for column, (field, required) in CERTIFICATE_COLUMNS.items()
+                 if column in header}
+
+    standards = {standard.standard_name: standard for standard in ISOStandard.objects.all()}
+    certificates, seen_numbers = [], {}
+    for line, row in enumerate(rows, start=2):
+        values = {field: row[position] if position < len(row) else None for field, position in positions.items()}
+        if not any(_text(value) for value in values.values()):
+            continue
+        result['rows'] += 1
+        try:
+            certificate = _build_certificate(values, standards)
+        except CertificateRowError as e:
+            result['errors'].append((line, str(e)))
+            continue
+        number = certificate.certificate_number_part
+        if number:
+            if number in seen_numbers:
+                result['errors'].append((line, f'номер {number} повторяется в строке {seen_numbers[number]}'))
+                continue
+            seen_numbers[number] = line
+        certificates.append(certificate)
+
+    numbers, taken = list(seen_numbers), set()
+    for start in range(0, len(numbers), 500):
+        taken.update(Certificate.objects.filter(certificate_number_part__in=numbers[start:start + 500])
+                     .values_list('certificate_number_part', flat=True))
+    for number in sorted(taken):
+        result['errors'].append((seen_numbers[number], f'номер {number} уже занят'))
+    result['errors'].sort()
+
+    if result['errors'] or dry_run or not certificates:
+        return result
+
+    with transaction.atomic():
+        # Сначала счетчик сдвигается за явно указанные номера, затем остальные получают номера одним блоком.
+        # Счетчик блокируется до конца транзакции, при откате номера не теряются
+        if seen_numbers:
+            NumberSequence.advance_to(Certificate.CERTIFICATE_NUMBER_SEQUENCE, max(int(n) for n in seen_numbers))
+        unnumbered = [certificate for certificate in certificates if not certificate.certificate_number_part]
+        if unnumbered:
+            for certificate, number in zip(unnumbered, Certificate.allocate_numbers(len(unnumbered))):
+                certificate.certificate_number_part = number
+
+        for certificate in certificates:
+            certificate.fill_derived_fields(is_new=True)
+        Certificate.objects.bulk_create(certificates, batch_size=batch_size)
+
+        ImportRecord.objects.create(
+            kind=IMPORT_KIND, file_name=filename[:255], file_hash=file_hash,
+            rows=result['rows'], created=len(certificates),
+        )
+
+        ids = [certificate.pk for certificate in certificates]
+        if render and ids:
+            transaction.on_commit(lambda: enqueue_rendering(ids))
+
+    result['created'] = len(certificates)
+    logger.info(f"Импорт сертификатов из {filename}: создано {result['created']}")
+    return result
+
+
+def enqueue_rendering(ids):
+    """Ставит генерацию QR-кодов и документов в очередь пачками"""
+    chunk_size = getattr(settings, 'RENDER_CHUNK_SIZE', 20)
+    for start in range(0, len(ids), chunk_size):
+        render_documents_task.delay(ids[start:start + chunk_size])
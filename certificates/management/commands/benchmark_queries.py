@@ -0,0 +1,137 @@
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from datetime import timedelta
+from certificates.models import Certificate, ISOStandard
+from certificates.sitemaps import CertificateSitemap
+from certificates.statuses import _transition_updates
+from certificates.utils import get_notification_candidates
+from certificates.views import search_certificates
+import random
+import string
+import time
+
+ALPHABET = string.digits + string.ascii_uppercase
+STATUSES = ['active', 'active', 'active', 'inspection_failed', 'expired']
+INSPECTION_STATUSES = ['pending', 'passed', 'failed']
+
+
+def synthetic_number(index):
+    """Номер вида 'Zxxxx' в base36: не пересекается с существующими цифровыми номерами"""
+    digits = ''
+    for _ in range(4):
+        index, remainder = divmod(index, 36)
+        digits = ALPHABET[remainder] + digits
+    return f'Z{digits}'
+
+
+class Command(BaseCommand):
+    help = 'Заполняет реестр синтетическими сертификатами и выводит планы и время запросов представлений и задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Количество синтетических сертификатов')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов каждого запроса')
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (только PostgreSQL)')
+        parser.add_argument('--keep', action='store_true', help='Не откатывать созданные данные')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if not 0 < count <= 36 ** 4:
+            raise CommandError(f'--count должен быть от 1 до {36 ** 4}')
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._seed(count)
+            self.stdout.write(f'Создано {count} сертификатов за {time.perf_counter() - started:.2f} с')
+
+            for name, queryset in self._hot_queries():
+                self._report(name, queryset, options['repeat'], options['analyze'])
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write('Синтетические данные откатываются')
+
+    def _seed(self, count):
+        standard = ISOStandard.objects.create(
+            standard_name='BENCHMARK', description='Синтетический стандарт',
+            certificate_number_prefix='.BM', certificate_standard_name='BENCHMARK',
+        )
+        today = timezone.localdate()
+        rng = random.Random(42)
+        batch = []
+        for index in range(count):
+            start_date = today - timedelta(days=rng.randint(0, 3 * 365))
+            number = synthetic_number(index)
+            certificate = Certificate(
+                name=f'Организация {index}', inn=f'{rng.randint(10 ** 9, 10 ** 10 - 1)}', address='Адрес',
+                certificate_number_part=number, full_certificate_number=f'№SMK.{number}.BM',
+                iso_standard=standard, iso_standard_name='BENCHMARK', quality_management_system='СМК',
+                start_date=start_date, expiry_date=start_date + timedelta(days=3 * 365),
+                first_inspection_date=start_date + timedelta(days=365),
+                second_inspection_date=start_date + timedelta(days=2 * 365),
+                first_inspection_status=rng.choice(INSPECTION_STATUSES),
+                second_inspection_status=rng.choice(INSPECTION_STATUSES),
+                status=rng.choice(STATUSES), notifications_enabled=rng.random() < 0.7,
+                certification_area='Область', client_email=f'client{index}@example.com',
+            )
+            certificate.next_status_change_on = certificate.calculate_next_status_change(today)
+            batch.append(certificate)
+            if len(batch) >= 5000:
+                Certificate.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Certificate.objects.bulk_create(batch)
+
+        # Обновляем статистику, чтобы планировщик видел реальное распределение данных
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _hot_queries(self):
+        """Запросы в том виде, в котором их выполняют представления, админка, sitemap и фоновые задачи"""
+        today = timezone.localdate()
+        probe = Certificate.objects.filter(iso_standard__standard_name='BENCHMARK').order_by('?').first()
+        number = probe.certificate_number_part
+
+        request = RequestFactory().get('/admin/certificates/certificate/')
+        request.user = AnonymousUser()
+        certificate_admin = admin.site._registry[Certificate]
+        admin_queryset = certificate_admin.get_queryset(request)
+        admin_search, _ = certificate_admin.get_search_results(request, admin_queryset, probe.inn)
+
+        queries = [
+            ('Публичный поиск: полный номер', search_certificates(f'SMK.{number}.BM')),
+            ('Публичный поиск: номер', search_certificates(number)),
+            ('Публичный поиск: часть номера', search_certificates(number[1:4])),
+            ('Публичная страница сертификата', Certificate.objects.select_related('iso_standard').filter(id=probe.id)),
+            ('Админка: список', admin_queryset[:certificate_admin.list_per_page]),
+            ('Админка: поиск', admin_search[:certificate_admin.list_per_page]),
+            # count() и update() сбрасывают сортировку по умолчанию
+            ('Статистика: действующие', Certificate.objects.filter(status='active').order_by()),
+            ('Sitemap', CertificateSitemap().items()),
+            ('Кандидаты для уведомлений', get_notification_candidates(today)),
+            ('Обновление статусов: наступившие', Certificate.objects.filter(next_status_change_on__lte=today).order_by()),
+        ]
+        due = Certificate.objects.filter(next_status_change_on__lte=today).order_by()
+        for name, condition, values in _transition_updates(today):
+            queries.append((f'Обновление статусов: {name}', due.filter(condition)))
+        return queries
+
+    def _report(self, name, queryset, repeat, analyze):
+        explain_options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+        plan = queryset.explain(**explain_options)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            # all() создает копию без кэша результатов, иначе повторы не обращаются к базе
+            rows = len(queryset.all())
+            timings.append(time.perf_counter() - started)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}'))
+        self.stdout.write(plan)
+        self.stdout.write(self.style.SUCCESS(
+            f'строк: {rows}, лучшее время: {min(timings) * 1000:.2f} мс, среднее: {sum(timings) / len(timings) * 1000:.2f} мс'
+        ))
@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Модули, которые не должны загружаться при старте веб-воркера
+HEAVY_MODULES = ['PIL', 'qrcode', 'psd_tools', 'numpy', 'skimage', 'openpyxl']
+
+# Запускается в отдельном интерпретаторе: то же, что делает gunicorn при старте воркера
+BOOT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+from django.template import engines
+for engine in engines.all():
+    getattr(engine, 'engine', None) and engine.engine.template_libraries
+seconds = time.perf_counter() - started
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss = rss / 1024 if sys.platform == 'darwin' else rss
+except ImportError:
+    rss = None
+heavy = sorted({name.split('.')[0] for name in sys.modules} & set(json.loads(sys.argv[1])))
+print(json.dumps({'seconds': seconds, 'rss_kb': rss, 'heavy': heavy}))
+'''
+
+
+def parse_importtime(stderr):
+    """Разбирает вывод -X importtime: {пакет верхнего уровня: накопленное время в мкс}"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        if name.startswith('  '):
+            # Вложенный импорт уже учтен в накопленном времени родителя
+            continue
+        name = name.strip()
+        cumulative[name] = cumulative.get(name, 0) + int(cumulative_us)
+    return cumulative
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время холодного старта веб-воркера, память и загруженные тяжелые модули'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Количество запусков')
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых долгих импортов показать')
+        parser.add_argument('--max-seconds', type=float, help='Ошибка, если лучшее время старта больше')
+        parser.add_argument('--max-rss', type=float, help='Ошибка, если память после старта больше (МБ)')
+        parser.add_argument('--no-heavy', action='store_true',
+                            help=f'Ошибка, если при старте загружается один из модулей {HEAVY_MODULES}')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'cert_checker.settings')
+
+        runs, imports = [], {}
+        for _ in range(max(options['repeat'], 1)):
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT, json.dumps(HEAVY_MODULES)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if process.returncode:
+                raise CommandError(f'Воркер не запустился:\n{process.stderr[-2000:]}')
+            runs.append(json.loads(process.stdout.strip().splitlines()[-1]))
+            imports = parse_importtime(process.stderr)
+
+        seconds = [run['seconds'] for run in runs]
+        rss_mb = runs[-1]['rss_kb'] / 1024 if runs[-1]['rss_kb'] else None
+        heavy = runs[-1]['heavy']
+
+        self.stdout.write(f'Старт воркера: лучшее {min(seconds):.3f} с, среднее {statistics.mean(seconds):.3f} с '
+                          f'(запусков: {len(runs)})')
+        self.stdout.write(f'Память после старта: {rss_mb:.1f} МБ' if rss_mb else 'Память: недоступно на этой ОС')
+        self.stdout.write(f'Тяжелые модули: {", ".join(heavy) if heavy else "не загружены"}')
+
+        self.stdout.write('\nСамые долгие импорты (накопленное время, последний запуск):')
+        for name, microseconds in sorted(imports.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {microseconds / 1000:8.1f} мс  {name}')
+
+        failures = []
+        if options['max_seconds'] is not None and min(seconds) > options['max_seconds']:
+            failures.append(f'время старта {min(seconds):.3f} с больше {options["max_seconds"]} с')
+        if options['max_rss'] is not None and rss_mb and rss_mb > options['max_rss']:
+            failures.append(f'память {rss_mb:.1f} МБ больше {options["max_rss"]} МБ')
+        if options['no_heavy'] and heavy:
+            failures.append(f'при старте загружаются {heavy}')
+        if failures:
+            raise CommandError('; '.join(failures))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from certificates.importers import import_certificates
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт сертификатов из CSV или XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', type=str, help='Путь к CSV/XLSX файлу с сертификатами')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить строки, ничего не создавая')
+        parser.add_argument('--force', action='store_true',
+                            help='Импортировать, даже если этот файл уже импортировался')
+        parser.add_argument('--no-render', action='store_true',
+                            help='Не ставить генерацию QR-кодов и документов в очередь')
+        parser.add_argument('--batch-size', type=int, default=None, help='Размер пачки INSERT')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл "{path}" не найден')
+
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            result = import_certificates(
+                f, os.path.basename(path), dry_run=options['dry_run'], force=options['force'],
+                render=not options['no_render'], batch_size=options['batch_size'],
+            )
+        elapsed = time.perf_counter() - started
+
+        if result['skipped']:
+            self.stdout.write(self.style.WARNING('Этот файл уже импортирован, пропускаем (используйте --force)'))
+            return
+        for line, message in result['errors']:
+            self.stdout.write(self.style.ERROR(f'Строка {line}: {message}'))
+        if result['errors']:
+            raise CommandError(f'Ошибок: {len(result["errors"])}, сертификаты не созданы')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'[dry-run] Строк проверено: {result["rows"]}, ошибок нет'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Создано сертификатов: {result["created"]} за {elapsed:.2f} с'
+            ))
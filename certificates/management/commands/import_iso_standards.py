@@ -1,79 +1,130 @@
-import pandas as pd
 from django.core.management.base import BaseCommand, CommandError
-from certificates.models import ISOStandard
+from django.db import transaction
+from certificates.models import ISOStandard, ImportRecord
+from certificates.page_cache import invalidate_detail_pages
+from openpyxl import load_workbook
+import hashlib
 import os
 
+IMPORT_KIND = 'iso_standards'
+
+# Столбец файла -> поле модели
+COLUMNS = {
+    'Стандарт ИСО': 'standard_name',
+    'Расшифровка стандарта': 'description',
+    'Нумерация в сертификате': 'certificate_number_prefix',
+    'Наименование стандарта в сертификате': 'certificate_standard_name',
+}
+UPDATE_FIELDS = ['description', 'certificate_number_prefix', 'certificate_standard_name']
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def cell_text(value):
+    return '' if value is None else str(value).strip()
+
+
 class Command(BaseCommand):
     help = 'Import ISO standards from Excel file'
 
     def add_arguments(self, parser):
         parser.add_argument('excel_file', type=str, help='Path to Excel file with ISO standards')
+        parser.add_argument('--force', action='store_true',
+                            help='Импортировать, даже если файл не менялся с прошлого импорта')
 
     def handle(self, *args, **options):
         excel_file = options['excel_file']
-        
+
         if not os.path.exists(excel_file):
             raise CommandError(f'File "{excel_file}" does not exist.')
 
+        file_hash = file_sha256(excel_file)
+        if not options['force'] and ImportRecord.last_hash(IMPORT_KIND) == file_hash:
+            self.stdout.write(self.style.SUCCESS('Файл не изменился с прошлого импорта, пропускаем'))
+            return
+
         try:
-            # Чтение Excel-файла
-            df = pd.read_excel(excel_file, header=0)
-            
-            # Проверка наличия необходимых столбцов
-            required_columns = ['Стандарт ИСО', 'Расшифровка стандарта', 'Нумерация в сертификате', 'Наименование стандарта в сертификате']
-            for column in required_columns:
-                if column not in df.columns:
-                    self.stdout.write(self.style.ERROR(f'В файле отсутствует столбец "{column}"'))
-                    self.stdout.write(f'Доступные столбцы: {list(df.columns)}')
-                    return
-            
-            # Счетчики для статистики
-            created_count = 0
-            updated_count = 0
-            error_count = 0
-            
-            # Обработка строк до первой пустой ячейки в столбце "Стандарт ИСО"
-            for index, row in df.iterrows():
-                if pd.isna(row['Стандарт ИСО']) or str(row['Стандарт ИСО']).strip() == '':
-                    break
-                
-                try:
-                    standard_name = str(row['Стандарт ИСО']).strip()
-                    description = str(row['Расшифровка стандарта']).strip() if not pd.isna(row['Расшифровка стандарта']) else ''
-                    certificate_number_prefix = str(row['Нумерация в сертификате']).strip() if not pd.isna(row['Нумерация в сертификате']) else ''
-                    certificate_standard_name = str(row['Наименование стандарта в сертификате']).strip() if not pd.isna(row['Наименование стандарта в сертификате']) else ''
-                    
-                    # Проверка наличия стандарта в базе данных
-                    standard, created = ISOStandard.objects.update_or_create(
-                        standard_name=standard_name,
-                        defaults={
-                            'description': description,
-                            'certificate_number_prefix': certificate_number_prefix,
-                            'certificate_standard_name': certificate_standard_name
-                        }
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(
-                            self.style.SUCCESS(f'Создан: {standard_name}')
-                        )
-                    else:
-                        updated_count += 1
-                        self.stdout.write(
-                            self.style.WARNING(f'Обновлен: {standard_name}')
-                        )
-                        
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'Ошибка при обработке строки {index + 2}: {str(e)}'))
-                    error_count += 1
-            
-            # Вывод статистики
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Импорт завершен. Создано: {created_count}, обновлено: {updated_count}, ошибок: {error_count}'
+            rows, errors = self._read_rows(excel_file)
+        except CommandError:
+            raise
+        except Exception as e:
+            raise CommandError(f'Ошибка при чтении файла: {str(e)}')
+
+        existing = {standard.standard_name: standard for standard in ISOStandard.objects.all()}
+        created, updated, unchanged, prefix_changed = [], [], 0, []
+        for values in rows.values():
+            current = existing.get(values['standard_name'])
+            if current is None:
+                created.append(ISOStandard(**values))
+            elif any(getattr(current, field) != values[field] for field in UPDATE_FIELDS):
+                updated.append(ISOStandard(**values))
+                if current.certificate_number_prefix != values['certificate_number_prefix']:
+                    prefix_changed.append(current.standard_name)
+            else:
+                unchanged += 1
+
+        with transaction.atomic():
+            if created or updated:
+                # Один INSERT ... ON CONFLICT (standard_name) DO UPDATE на все новые и измененные стандарты
+                ISOStandard.objects.bulk_create(
+                    created + updated, update_conflicts=True,
+                    unique_fields=['standard_name'], update_fields=UPDATE_FIELDS,
                 )
+            # bulk_create не вызывает save() и сигналы, поэтому полные номера и кэш страниц обновляем явно
+            for standard in ISOStandard.objects.filter(standard_name__in=prefix_changed):
+                standard.refresh_certificate_numbers()
+            if updated:
+                transaction.on_commit(invalidate_detail_pages)
+            ImportRecord.objects.create(
+                kind=IMPORT_KIND, file_name=os.path.basename(excel_file), file_hash=file_hash,
+                rows=len(rows), created=len(created), updated=len(updated), unchanged=unchanged, errors=errors,
             )
-            
-        except Exception as e:
-            raise CommandError(f'Ошибка при чтении файла: {str(e)}')
\ No newline at end of file
+
+        for standard in created:
+            self.stdout.write(self.style.SUCCESS(f'Создан: {standard.standard_name}'))
+        for standard in updated:
+            self.stdout.write(self.style.WARNING(f'Обновлен: {standard.standard_name}'))
+
+        # Вывод статистики
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Импорт завершен. Создано: {len(created)}, обновлено: {len(updated)}, '
+                f'без изменений: {unchanged}, ошибок: {errors}'
+            )
+        )
+
+    def _read_rows(self, excel_file):
+        """Потоково читает лист до первой пустой ячейки в столбце "Стандарт ИСО"; повторы имени - последняя строка"""
+        workbook = load_workbook(excel_file, read_only=True, data_only=True)
+        try:
+            sheet_rows = workbook.active.iter_rows(values_only=True)
+            header = [cell_text(value) for value in next(sheet_rows, ())]
+
+            # Проверка наличия необходимых столбцов
+            missing = [column for column in COLUMNS if column not in header]
+            if missing:
+                raise CommandError(f'В файле отсутствуют столбцы {missing}. Доступные столбцы: {header}')
+            positions = {field: header.index(column) for column, field in COLUMNS.items()}
+            max_lengths = {field: ISOStandard._meta.get_field(field).max_length for field in positions}
+
+            rows, errors = {}, 0
+            for line, row in enumerate(sheet_rows, start=2):
+                values = {field: cell_text(row[position] if position < len(row) else None)
+                          for field, position in positions.items()}
+                if not values['standard_name']:
+                    break
+                too_long = [field for field, limit in max_lengths.items() if limit and len(values[field]) > limit]
+                if too_long:
+                    self.stdout.write(self.style.ERROR(f'Ошибка при обработке строки {line}: слишком длинные значения {too_long}'))
+                    errors += 1
+                    continue
+                rows[values['standard_name']] = values
+            return rows, errors
+        finally:
+            workbook.close()
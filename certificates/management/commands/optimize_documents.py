@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from certificates.models import Certificate, Auditor
+from certificates.optimization import optimize_documents
+from certificates.thumbnails import generate_thumbnails_for
+
+
+class Command(BaseCommand):
+    help = 'Сжимает PNG уже созданных документов (сертификаты, разрешения, аудиты) и выводит экономию по каждому файлу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать экономию, файлы не менять')
+        parser.add_argument('--compress-level', type=int, choices=range(10), metavar='0-9',
+                            help='Уровень сжатия zlib (по умолчанию PNG_COMPRESS_LEVEL)')
+        parser.add_argument('--quantize', action='store_true', default=None,
+                            help='Переводить почти плоские документы в палитру с потерями (по умолчанию PNG_QUANTIZE)')
+        parser.add_argument('--limit', type=int, help='Обработать не больше указанного числа объектов каждой модели')
+
+    def handle(self, *args, **options):
+        querysets = [
+            Certificate.objects.exclude(Q(file1='') | Q(file1__isnull=True), Q(file2='') | Q(file2__isnull=True)),
+            Auditor.objects.exclude(audit_file='').exclude(audit_file__isnull=True),
+        ]
+        total_before = total_after = files = 0
+        for queryset in querysets:
+            queryset = queryset.order_by('pk')
+            if options['limit']:
+                queryset = queryset[:options['limit']]
+            for instance in queryset.iterator(chunk_size=200):
+                report = optimize_documents([instance], dry_run=options['dry_run'],
+                                            compress_level=options['compress_level'], quantize=options['quantize'])
+                if report and not options['dry_run']:
+                    generate_thumbnails_for([instance])
+                for name, before, after in report:
+                    files += 1
+                    total_before += before
+                    total_after += after
+                    self.stdout.write(f'{name}: {before} -> {after} байт (-{(before - after) * 100 / before:.1f}%)')
+
+        saved = total_before - total_after
+        percent = saved * 100 / total_before if total_before else 0
+        prefix = 'Можно сэкономить' if options['dry_run'] else 'Сэкономлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {files}, было {total_before} байт, стало {total_after}. {prefix} {saved} байт ({percent:.1f}%)'
+        ))
@@ -0,0 +1,59 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from certificates.thumbnails import source_name
+from certificates.media import (
+    all_referenced_names, scan_media_files, modified_timestamp, clear_dangling_references, remove_empty_folders,
+)
+import time
+
+
+class Command(BaseCommand):
+    help = 'Сверяет файлы в хранилище медиа со ссылками в базе: ищет файлы-сироты и ссылки на отсутствующие файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Удалить файлы, на которые не ссылается ни один объект')
+        parser.add_argument('--clear-dangling', action='store_true',
+                            help='Очистить ссылки на отсутствующие файлы')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе указанного числа секунд (загружаемые прямо сейчас)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Сначала читаем ссылки, затем диск: файл, загруженный между шагами, не попадет в сироты
+        referenced = all_referenced_names()
+        files = scan_media_files()
+
+        cutoff = time.time() - options['min_age']
+        # Превью - сирота, если сирота его исходное изображение
+        orphans = [name for name, entry in files.items()
+                   if name not in referenced and source_name(name) not in referenced
+                   and modified_timestamp(name, entry) < cutoff]
+        dangling = referenced - files.keys()
+
+        self.stdout.write(f'Файлов в хранилище: {len(files)}, ссылок в базе: {len(referenced)}')
+        self.stdout.write(f'Файлов-сирот: {len(orphans)}, ссылок на отсутствующие файлы: {len(dangling)}')
+        if options['verbosity'] > 1:
+            for name in sorted(orphans):
+                self.stdout.write(f'  сирота: {name}')
+            for name in sorted(dangling):
+                self.stdout.write(f'  нет файла: {name}')
+
+        if options['delete_orphans'] and orphans:
+            removed = 0
+            for name in orphans:
+                try:
+                    default_storage.delete(name)
+                    removed += 1
+                except Exception as e:
+                    self.stderr.write(f'Не удалось удалить {name}: {e}')
+            remove_empty_folders()
+            self.stdout.write(self.style.SUCCESS(f'Удалено файлов-сирот: {removed}'))
+
+        if options['clear_dangling'] and dangling:
+            with transaction.atomic():
+                cleared = clear_dangling_references(dangling)
+            self.stdout.write(self.style.SUCCESS(f'Очищено ссылок: {cleared}'))
+
+        self.stdout.write(f'Готово за {time.perf_counter() - started:.2f} с')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from certificates import tasks
+
+# Задачи CELERY_BEAT_SCHEDULE для запуска по расписанию без брокера (cron, планировщик Windows)
+JOBS = {
+    'statuses': tasks.refresh_statuses_task,
+    'notifications': tasks.send_notifications_task,
+    'deliver': tasks.deliver_notifications_task,
+    'sweep': tasks.sweep_deleted_files_task,
+    'cleanup': tasks.cleanup_media_task,
+}
+
+DAILY_JOBS = ['statuses', 'notifications', 'sweep', 'cleanup']
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задачи обслуживания в текущем процессе: обновление статусов, уведомления, очистку медиа. '
+            'Нужна, когда celery beat не запущен (нет REDIS_URL); вызывается из cron или планировщика Windows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('jobs', nargs='*', metavar='job',
+                            help=f'{", ".join(JOBS)} (по умолчанию ежедневные: {", ".join(DAILY_JOBS)})')
+
+    def handle(self, *args, **options):
+        jobs = options['jobs'] or DAILY_JOBS
+        unknown = [name for name in jobs if name not in JOBS]
+        if unknown:
+            raise CommandError(f'Неизвестные задачи: {", ".join(unknown)}')
+
+        failures = []
+        for name in jobs:
+            # Вызов без delay: без брокера подзадачи выполняются здесь же.
+            # Повторный запуск за тот же день пропускает уже обработанные диапазоны
+            try:
+                result = JOBS[name]()
+            except Exception as e:
+                failures.append(f'{name}: {e}')
+                continue
+            self.stdout.write(f'{name}: {result}')
+
+        if failures:
+            raise CommandError('; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Обслуживание завершено'))
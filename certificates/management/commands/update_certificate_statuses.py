@@ -1,28 +1,32 @@
 from django.core.management.base import BaseCommand
-from certificates.models import Certificate
-from django.utils import timezone
+from certificates.statuses import refresh_statuses, TRANSITIONS
 import logging
 
 logger = logging.getLogger(__name__)
 
+TRANSITION_LABELS = {
+    'first_inspection_failed': '1-й инспекционный контроль просрочен',
+    'second_inspection_failed': '2-й инспекционный контроль просрочен',
+    'expired': 'срок действия истек',
+    'inspection_failed': 'приостановлен по инспекционному контролю',
+    'active': 'восстановлен как действующий',
+}
+
 class Command(BaseCommand):
     help = 'Обновляет статусы сертификатов на основе дат и инспекционных контролей'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Посчитать изменения без записи в базу данных')
+        parser.add_argument('--all', action='store_true',
+                            help='Проверить весь реестр, а не только сертификаты с наступившей датой смены статуса')
+
     def handle(self, *args, **options):
-        today = timezone.now().date()
-        certificates = Certificate.objects.all()
-        updated_count = 0
-        
-        for certificate in certificates:
-            old_status = certificate.status
-            new_status = certificate.calculate_status()
-            
-            if old_status != new_status:
-                certificate.status = new_status
-                certificate.save(update_fields=['status'])
-                updated_count += 1
-                self.stdout.write(self.style.SUCCESS(
-                    f'Обновлен статус сертификата {certificate.full_certificate_number}: {old_status} -> {new_status}'
-                ))
-        
-        self.stdout.write(self.style.SUCCESS(f'Обновлено {updated_count} сертификатов из {certificates.count()}'))
\ No newline at end of file
+        dry_run = options['dry_run']
+        counts = refresh_statuses(dry_run=dry_run, due_only=not options['all'])
+
+        for name in TRANSITIONS:
+            self.stdout.write(f'{TRANSITION_LABELS[name]}: {counts[name]}')
+
+        prefix = '[dry-run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(f'{prefix}Обновлено переходов: {sum(counts.values())}'))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from certificates.warmup import PHASES, warm_caches
+import time
+
+
+class Command(BaseCommand):
+    help = 'Прогревает кэши после деплоя: шаблоны, PSD-шаблоны, QR-коды, превью и публичные страницы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--phase', action='append', choices=PHASES, dest='phases',
+                            help='Фаза прогрева; можно указать несколько раз (по умолчанию все)')
+        parser.add_argument('--workers', type=int, default=4, help='Количество потоков для QR-кодов, превью и страниц')
+        parser.add_argument('--limit', type=int, help='Прогревать не больше N действующих сертификатов')
+        parser.add_argument('--host', help='Хост публичных ссылок (по умолчанию WARMUP_HOST или ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        phases = options['phases'] or PHASES
+        if 'pages' in phases and settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+            self.stdout.write(self.style.WARNING(
+                'Кэш в памяти процесса: страницы, прогретые командой, не видны воркерам (нужен REDIS_URL)'
+            ))
+
+        started = time.perf_counter()
+        for phase, count, seconds in warm_caches(phases, options['workers'], options['limit'], options['host']):
+            self.stdout.write(f'{phase:<10} {count:>7}  {seconds:7.2f} с')
+        self.stdout.write(self.style.SUCCESS(f'Прогрев завершен за {time.perf_counter() - started:.2f} с'))
@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import Q
+from .models import Certificate, Auditor, PendingFileDeletion
+from .storage import is_local_storage
+from .thumbnails import THUMBNAIL_DIR, thumbnail_names
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FOLDERS = ['certificates', 'permissions', 'audit_files', 'qr_codes', 'audit_images', THUMBNAIL_DIR]
+
+FILE_MODELS = (Certificate, Auditor)
+
+
+def _file_fields(model):
+    return [field.name for field in model._meta.fields if isinstance(field, models.FileField)]
+
+
+def referenced_names(names):
+    """Возвращает имена из списка, на которые еще ссылаются сертификаты или аудиторы"""
+    referenced = set()
+    for model in FILE_MODELS:
+        fields = _file_fields(model)
+        query = Q()
+        for field in fields:
+            query |= Q(**{f'{field}__in': names})
+        for row in model.objects.filter(query).values_list(*fields):
+            referenced.update(row)
+    return referenced & set(names)
+
+
+def all_referenced_names():
+    """Все пути файлов, на которые ссылаются объекты: один запрос на модель"""
+    referenced = set()
+    for model in FILE_MODELS:
+        for row in model.objects.values_list(*_file_fields(model)).iterator(chunk_size=5000):
+            referenced.update(name for name in row if name)
+    return referenced
+
+
+def scan_media_files(storage=None):
+    """
+    Возвращает {путь в хранилище: DirEntry или None} для всех файлов в папках медиа.
+
+    Локальный диск обходится через os.scandir; для остальных хранилищ (S3)
+    используется Storage.listdir, и вместо DirEntry возвращается None.
+    Пути записываются с '/' независимо от ОС, как они хранятся в FileField.
+    """
+    storage = storage or default_storage
+    files = {}
+    if is_local_storage(storage):
+        root = storage.location
+        stack = [folder for folder in MEDIA_FOLDERS if os.path.isdir(os.path.join(root, folder))]
+        while stack:
+            relative_dir = stack.pop()
+            with os.scandir(os.path.join(root, relative_dir)) as entries:
+                for entry in entries:
+                    name = f'{relative_dir}/{entry.name}'
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(name)
+                    elif entry.is_file(follow_symlinks=False):
+                        files[name] = entry
+        return files
+
+    stack = list(MEDIA_FOLDERS)
+    while stack:
+        relative_dir = stack.pop()
+        directories, filenames = storage.listdir(relative_dir)
+        stack.extend(f'{relative_dir}/{directory}' for directory in directories)
+        files.update((f'{relative_dir}/{filename}', None) for filename in filenames)
+    return files
+
+
+def modified_timestamp(name, entry, storage=None):
+    """Время изменения файла из scan_media_files в секундах"""
+    if entry is not None:
+        return entry.stat(follow_symlinks=False).st_mtime
+    return (storage or default_storage).get_modified_time(name).timestamp()
+
+
+def clear_dangling_references(names):
+    """Очищает поля, ссылающиеся на отсутствующие файлы, массовыми UPDATE по каждому полю"""
+    cleared = 0
+    names = list(names)
+    for model in FILE_MODELS:
+        for field in _file_fields(model):
+            for start in range(0, len(names), 500):
+                cleared += model.objects.filter(**{f'{field}__in': names[start:start + 500]}).update(**{field: None})
+    return cleared
+
+
+def remove_empty_folders(storage=None):
+    """Удаляет пустые папки медиа на локальном диске, начиная с самых вложенных"""
+    storage = storage or default_storage
+    if not is_local_storage(storage):
+        # В объектных хранилищах папок нет
+        return 0
+    removed = 0
+    for folder in MEDIA_FOLDERS:
+        folder_path = os.path.join(storage.location, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for dirpath, dirnames, filenames in os.walk(folder_path, topdown=False):
+            try:
+                if not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Не удалось удалить папку {dirpath}: {e}")
+    return removed
+
+
+def _delete_thumbnails(name):
+    """Удаляет превью удаленного изображения; отсутствующие превью пропускаются хранилищем"""
+    for thumbnail in thumbnail_names(name):
+        try:
+            default_storage.delete(thumbnail)
+        except Exception as e:
+            # Оставшееся превью найдет reconcile_media
+            logger.warning(f"Не удалось удалить превью {thumbnail}: {e}")
+
+
+def sweep_deleted_files(batch_size=None, max_batches=None):
+    """
+    Удаляет из хранилища файлы из очереди PendingFileDeletion пачками.
+
+    Файл, на который снова ссылается какой-либо объект, только снимается с очереди.
+    Строки с ошибкой удаления остаются в очереди до следующего запуска.
+    Возвращает количество удаленных файлов.
+    """
+    batch_size = batch_size or getattr(settings, 'MEDIA_GC_BATCH_SIZE', 200)
+    max_attempts = getattr(settings, 'MEDIA_GC_MAX_ATTEMPTS', 5)
+    deleted = 0
+    last_pk = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            pending = list(
+                PendingFileDeletion.objects.select_for_update(skip_locked=True)
+                .filter(pk__gt=last_pk, attempts__lt=max_attempts).order_by('pk')[:batch_size]
+            )
+            if not pending:
+                break
+            last_pk = pending[-1].pk
+            batches += 1
+
+            referenced = referenced_names([item.name for item in pending])
+            done, failed = [], []
+            for item in pending:
+                if item.name in referenced:
+                    done.append(item.pk)
+                    continue
+                try:
+                    default_storage.delete(item.name)
+                except Exception as e:
+                    item.attempts += 1
+                    item.last_error = str(e)
+                    failed.append(item)
+                    logger.warning(f"Не удалось удалить файл {item.name}: {e}")
+                else:
+                    done.append(item.pk)
+                    deleted += 1
+                    _delete_thumbnails(item.name)
+
+            PendingFileDeletion.objects.filter(pk__in=done).delete()
+            if failed:
+                PendingFileDeletion.objects.bulk_update(failed, ['attempts', 'last_error'])
+
+    if deleted:
+        remove_empty_folders()
+    logger.info(f"Очистка медиа: удалено файлов {deleted}")
+    return deleted
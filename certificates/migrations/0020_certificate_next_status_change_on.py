@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:58
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_existing_certificates(apps, schema_editor):
+    # Существующие сертификаты обрабатываются при ближайшем запуске обновления статусов,
+    # который и рассчитает для них настоящую дату следующей смены статуса
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Certificate.objects.update(next_status_change_on=timezone.now().date())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0019_remove_certificate_generated_permission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='next_status_change_on',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True, verbose_name='Дата следующей смены статуса'),
+        ),
+        migrations.RunPython(schedule_existing_certificates, migrations.RunPython.noop),
+    ]
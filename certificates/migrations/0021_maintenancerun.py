@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0020_certificate_next_status_change_on'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=100, verbose_name='Задача')),
+                ('run_date', models.DateField(verbose_name='Дата запуска')),
+                ('chunk_start', models.BigIntegerField(verbose_name='Начало диапазона id')),
+                ('chunk_end', models.BigIntegerField(verbose_name='Конец диапазона id')),
+                ('status', models.CharField(choices=[('started', 'Выполняется'), ('done', 'Завершено')], default='started', max_length=10, verbose_name='Статус')),
+                ('result', models.IntegerField(default=0, verbose_name='Результат')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание')),
+            ],
+            options={
+                'verbose_name': 'Запуск фоновой задачи',
+                'verbose_name_plural': 'Запуски фоновых задач',
+                'ordering': ['-run_date', 'task_name', 'chunk_start'],
+                'constraints': [models.UniqueConstraint(fields=('task_name', 'run_date', 'chunk_start'), name='unique_maintenance_chunk_per_day')],
+            },
+        ),
+    ]
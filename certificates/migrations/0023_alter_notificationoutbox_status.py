@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0022_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Отправлено'), ('dead', 'Не доставлено'), ('digest', 'Ожидает включения в сводку'), ('digested', 'Включено в сводку')], default='pending', max_length=10, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:04
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+
+def fill_full_certificate_numbers(apps, schema_editor):
+    ISOStandard = apps.get_model('certificates', 'ISOStandard')
+    Certificate = apps.get_model('certificates', 'Certificate')
+    for standard in ISOStandard.objects.all():
+        Certificate.objects.filter(iso_standard=standard).update(full_certificate_number=Concat(
+            Value('№SMK.'), F('certificate_number_part'), Value(standard.certificate_number_prefix),
+            output_field=models.CharField(),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0023_alter_notificationoutbox_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='full_certificate_number',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Полный номер сертификата'),
+        ),
+        migrations.RunPython(fill_full_certificate_numbers, migrations.RunPython.noop),
+    ]
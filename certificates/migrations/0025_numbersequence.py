@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_certificate_number_sequence(apps, schema_editor):
+    # Счетчик начинается с наибольшего существующего номера, чтобы не выдать занятый
+    Certificate = apps.get_model('certificates', 'Certificate')
+    NumberSequence = apps.get_model('certificates', 'NumberSequence')
+    max_number = Certificate.objects.aggregate(Max('certificate_number_part'))['certificate_number_part__max']
+    NumberSequence.objects.get_or_create(
+        name='certificate_number',
+        defaults={'last_value': int(max_number) if max_number and max_number.isdigit() else 1000},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0024_certificate_full_certificate_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('last_value', models.BigIntegerField(default=0, verbose_name='Последнее выданное значение')),
+            ],
+            options={
+                'verbose_name': 'Счетчик номеров',
+                'verbose_name_plural': 'Счетчики номеров',
+            },
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='certificate_number_part',
+            field=models.CharField(blank=True, max_length=5, unique=True, verbose_name='Номер сертификата (часть)'),
+        ),
+        migrations.RunPython(seed_certificate_number_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:05
+
+from django.db import migrations, models
+import re
+
+
+def seed_audit_sequences(apps, schema_editor):
+    # Счетчик не должен повторить номер, уже выданный аудитору (в том числе удаленным ранее),
+    # поэтому берется максимум из количества аудиторов и номеров в audit_number
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Auditor = apps.get_model('certificates', 'Auditor')
+    sequences = {}
+    for certificate_id, audit_number in Auditor.objects.values_list('certificate_id', 'audit_number').iterator():
+        match = re.match(r'№AUD\.(\d+)', audit_number or '')
+        used = int(match.group(1)) if match else 0
+        count, last = sequences.get(certificate_id, (0, 0))
+        sequences[certificate_id] = (count + 1, max(last, used))
+    for certificate_id, (count, last) in sequences.items():
+        Certificate.objects.filter(pk=certificate_id).update(audit_sequence=max(count, last))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0025_numbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='audit_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Последний выданный номер аудита'),
+        ),
+        migrations.RunPython(seed_audit_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0026_certificate_audit_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['status', 'expiry_date'], name='cert_status_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['notifications_enabled', 'expiry_date'], name='cert_notify_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['notifications_enabled', 'first_inspection_date'], name='cert_notify_first_insp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['notifications_enabled', 'second_inspection_date'], name='cert_notify_second_insp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['inn'], name='cert_inn_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['-created_at'], name='cert_created_idx'),
+        ),
+    ]
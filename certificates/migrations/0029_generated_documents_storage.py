@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:12
+
+import certificates.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0028_pendingfiledeletion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditor',
+            name='audit_file',
+            field=models.FileField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='audit_files/', verbose_name='Файл аудита'),
+        ),
+        migrations.AlterField(
+            model_name='auditor',
+            name='audit_file_psd',
+            field=models.FileField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='audit_files/', verbose_name='Файл аудита (PSD)'),
+        ),
+        migrations.AlterField(
+            model_name='auditor',
+            name='generated_audit_image',
+            field=models.ImageField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='audit_images/', verbose_name='Сгенерированное изображение аудита'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='file1',
+            field=models.FileField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='certificates/', verbose_name='Файл сертификата'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='file1_psd',
+            field=models.FileField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='certificates/', verbose_name='Сертификат (PSD)'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='file2',
+            field=models.FileField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='certificates/', verbose_name='Файл приложения'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='file2_psd',
+            field=models.FileField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='permissions/', verbose_name='Разрешение (PSD)'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='qr_code',
+            field=models.ImageField(blank=True, null=True, storage=certificates.storage.generated_documents_storage, upload_to='qr_codes/', verbose_name='QR-код'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:16
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_standards(apps, schema_editor):
+    """
+    Перед добавлением уникальности переносит сертификаты на самый ранний из одноименных стандартов.
+
+    Префикс стандарта входит в номера уже выданных сертификатов, поэтому дубликаты
+    с разными префиксами не объединяются: миграция останавливается со списком
+    таких стандартов, их нужно исправить вручную.
+    """
+    ISOStandard = apps.get_model('certificates', 'ISOStandard')
+    Certificate = apps.get_model('certificates', 'Certificate')
+    duplicates = list(ISOStandard.objects.values('standard_name')
+                      .annotate(total=Count('id'), keep=Min('id')).filter(total__gt=1))
+
+    conflicts = []
+    for duplicate in duplicates:
+        rows = ISOStandard.objects.filter(standard_name=duplicate['standard_name']).order_by('pk')
+        if len({row.certificate_number_prefix for row in rows}) > 1:
+            conflicts.extend(
+                f"id={row.pk} «{row.standard_name}» префикс «{row.certificate_number_prefix}», "
+                f"сертификатов: {Certificate.objects.filter(iso_standard_id=row.pk).count()}"
+                for row in rows
+            )
+    if conflicts:
+        raise RuntimeError(
+            "Одноименные стандарты ISO с разными префиксами номеров. Переименуйте или объедините их "
+            "вручную и повторите миграцию:\n" + "\n".join(conflicts)
+        )
+
+    for duplicate in duplicates:
+        extra = ISOStandard.objects.filter(standard_name=duplicate['standard_name']).exclude(pk=duplicate['keep'])
+        # Префиксы совпадают, поэтому полные номера сертификатов не меняются
+        Certificate.objects.filter(iso_standard__in=extra).update(iso_standard_id=duplicate['keep'])
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0029_generated_documents_storage'),
+    ]
+
+    # Только перенос данных: уникальность добавляет следующая миграция. В одной транзакции
+    # с изменением строк PostgreSQL не дает менять таблицу ("pending trigger events")
+    operations = [
+        migrations.RunPython(merge_duplicate_standards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0030_merge_duplicate_iso_standards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='isostandard',
+            name='standard_name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Стандарт ИСО'),
+        ),
+        migrations.CreateModel(
+            name='ImportRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Тип импорта')),
+                ('file_name', models.CharField(max_length=255, verbose_name='Файл')),
+                ('file_hash', models.CharField(max_length=64, verbose_name='SHA-256 файла')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Строк в файле')),
+                ('created', models.PositiveIntegerField(default=0, verbose_name='Создано')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Обновлено')),
+                ('unchanged', models.PositiveIntegerField(default=0, verbose_name='Без изменений')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('imported_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата импорта')),
+            ],
+            options={
+                'verbose_name': 'Импорт из файла',
+                'verbose_name_plural': 'Импорт из файлов',
+                'ordering': ['-imported_at'],
+                'indexes': [models.Index(fields=['kind', '-imported_at'], name='import_kind_idx')],
+            },
+        ),
+    ]
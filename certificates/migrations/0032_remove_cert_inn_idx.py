@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0031_iso_standard_unique_import_record'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='certificate',
+            name='cert_inn_idx',
+        ),
+    ]
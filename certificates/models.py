@@ -1,25 +1,47 @@
 
-from django.conf import settings
-import os
 import logging
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.utils.functional import cached_property
-from django.db.models.signals import pre_delete
+from django.db.models import F, Max, Value
+from django.db.models.functions import Concat
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from dateutil.relativedelta import relativedelta
+from datetime import timedelta
+from .storage import generated_documents_storage
+from .page_cache import invalidate_detail_pages
+from .thumbnails import is_image
 
 logger = logging.getLogger(__name__)
 
 class ISOStandard(models.Model):
-    standard_name = models.CharField(max_length=100, verbose_name="Стандарт ИСО")
+    standard_name = models.CharField(max_length=100, unique=True, verbose_name="Стандарт ИСО")
     description = models.TextField(verbose_name="Расшифровка стандарта")
     certificate_number_prefix = models.CharField(max_length=50, verbose_name="Префикс в сертификате")
     certificate_standard_name = models.CharField(max_length=255, verbose_name="Наименование стандарта в сертификате")
     
     def __str__(self):
         return self.standard_name
+
+    def save(self, *args, **kwargs):
+        prefix_changed = False
+        if self.pk:
+            old_prefix = ISOStandard.objects.filter(pk=self.pk).values_list('certificate_number_prefix', flat=True).first()
+            prefix_changed = old_prefix is not None and old_prefix != self.certificate_number_prefix
+        super().save(*args, **kwargs)
+        if prefix_changed:
+            self.refresh_certificate_numbers()
+
+    def refresh_certificate_numbers(self):
+        """Пересчитывает сохраненные полные номера сертификатов этого стандарта одним UPDATE"""
+        updated = Certificate.objects.filter(iso_standard=self).update(full_certificate_number=Concat(
+            Value('№SMK.'), F('certificate_number_part'), Value(self.certificate_number_prefix),
+            output_field=models.CharField(),
+        ))
+        # UPDATE не меняет updated_at, поэтому кэш страниц сбрасывается явно
+        invalidate_detail_pages()
+        return updated
     
     class Meta:
         verbose_name = "Стандарт ИСО"
@@ -27,7 +49,58 @@ class ISOStandard(models.Model):
         ordering = ['standard_name']
 
 
+class NumberSequence(models.Model):
+    """Счетчик для выдачи номеров без гонок между параллельными сохранениями"""
+    name = models.CharField('Название', max_length=50, unique=True)
+    last_value = models.BigIntegerField('Последнее выданное значение', default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, name, count=1, initial=0):
+        """
+        Резервирует блок из count номеров и возвращает его как range.
+
+        Строка счетчика блокируется на время короткой транзакции, поэтому
+        параллельные вызовы получают непересекающиеся блоки.
+        initial может быть функцией: она вызывается только при создании счетчика.
+        """
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(name=name).first()
+            if sequence is None:
+                try:
+                    with transaction.atomic():
+                        sequence = cls.objects.create(name=name, last_value=initial() if callable(initial) else initial)
+                except IntegrityError:
+                    # Счетчик только что создан параллельным запросом
+                    sequence = cls.objects.select_for_update().get(name=name)
+            first = sequence.last_value + 1
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value'])
+        return range(first, first + count)
+
+    @classmethod
+    def peek(cls, name, initial=0):
+        """Следующее значение без резервирования (для подсказки в формах)"""
+        last_value = cls.objects.filter(name=name).values_list('last_value', flat=True).first()
+        if last_value is None:
+            last_value = initial() if callable(initial) else initial
+        return last_value + 1
+
+    @classmethod
+    def advance_to(cls, name, value):
+        """Сдвигает счетчик так, чтобы он не выдал уже занятое вручную значение"""
+        return cls.objects.filter(name=name, last_value__lt=value).update(last_value=value)
+
+    class Meta:
+        verbose_name = 'Счетчик номеров'
+        verbose_name_plural = 'Счетчики номеров'
+
+
 class Certificate(models.Model):
+    CERTIFICATE_NUMBER_SEQUENCE = 'certificate_number'
+
     STATUS_CHOICES = [
         ('active', 'Действителен'),
         ('inspection_failed', 'Действие сертификата приостановлено, не пройден инспекционный контроль'),
@@ -46,7 +119,10 @@ class Certificate(models.Model):
     inn = models.CharField('ИНН организации', max_length=255)
     address = models.TextField('Адрес организации')
     
-    certificate_number_part = models.CharField(max_length=5, unique=True, verbose_name="Номер сертификата (часть)")
+    certificate_number_part = models.CharField(max_length=5, unique=True, blank=True, verbose_name="Номер сертификата (часть)")
+
+    full_certificate_number = models.CharField('Полный номер сертификата', max_length=64, blank=True,
+                                               editable=False, db_index=True)
 
     iso_standard = models.ForeignKey(ISOStandard, on_delete=models.CASCADE, verbose_name='Стандарт ISO')
     iso_standard_name = models.CharField(max_length=255, verbose_name='Наименование стандарта в сертификате', blank=True)
@@ -67,10 +143,10 @@ class Certificate(models.Model):
                                                choices=INSPECTION_STATUS_CHOICES, 
                                                default='pending')
     
-    file1 = models.FileField('Файл сертификата', upload_to='certificates/', null=True, blank=True)
-    file1_psd = models.FileField(upload_to='certificates/', blank=True, null=True, verbose_name="Сертификат (PSD)")
-    file2 = models.FileField('Файл приложения', upload_to='certificates/', null=True, blank=True)
-    file2_psd = models.FileField(upload_to='permissions/', null=True, blank=True, verbose_name="Разрешение (PSD)")
+    file1 = models.FileField('Файл сертификата', upload_to='certificates/', storage=generated_documents_storage, null=True, blank=True)
+    file1_psd = models.FileField(upload_to='certificates/', storage=generated_documents_storage, blank=True, null=True, verbose_name="Сертификат (PSD)")
+    file2 = models.FileField('Файл приложения', upload_to='certificates/', storage=generated_documents_storage, null=True, blank=True)
+    file2_psd = models.FileField(upload_to='permissions/', storage=generated_documents_storage, null=True, blank=True, verbose_name="Разрешение (PSD)")
     file3 = models.FileField('Дополнительный файл', upload_to='certificates/', null=True, blank=True)
     
     # Удаляем дублирующиеся поля для очистки файлов - оставляем только clear_*
@@ -87,26 +163,42 @@ class Certificate(models.Model):
     client_email = models.EmailField(blank=True, null=True, verbose_name="Email клиента")
     notifications_enabled = models.BooleanField(default=False, verbose_name="Уведомления подключены")
     certification_area = models.TextField(verbose_name="Область сертификации")
-    qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True, verbose_name='QR-код')
+    qr_code = models.ImageField(upload_to='qr_codes/', storage=generated_documents_storage, blank=True, null=True, verbose_name='QR-код')
+    audit_sequence = models.PositiveIntegerField('Последний выданный номер аудита', default=0, editable=False)
+    next_status_change_on = models.DateField('Дата следующей смены статуса', null=True, blank=True,
+                                             editable=False, db_index=True)
 
     
-    @cached_property
-    def full_certificate_number(self):
+    def build_full_certificate_number(self):
         iso_code = self.iso_standard.certificate_number_prefix
         return f"№SMK.{self.certificate_number_part}{iso_code}"
 
     def clean(self):
         super().clean()
+        if not self.certificate_number_part:
+            # Номер выдается счетчиком только при создании; у существующего сертификата он обязателен
+            if self.pk is not None:
+                raise ValidationError({'certificate_number_part': "Укажите номер сертификата."})
+            return
         if Certificate.objects.filter(certificate_number_part=self.certificate_number_part).exclude(pk=self.pk).exists():
             raise ValidationError({'certificate_number_part': "Этот номер сертификата уже занят."})
 
+    @classmethod
+    def _last_used_number(cls):
+        """Начальное значение счетчика: наибольший существующий номер или 01000"""
+        max_number = cls.objects.aggregate(Max('certificate_number_part'))['certificate_number_part__max']
+        return int(max_number) if max_number and max_number.isdigit() else 1000
+
     @classmethod
     def get_next_number(cls):
-        last_cert = cls.objects.order_by('-certificate_number_part').first()
-        if not last_cert:
-            return "01001"
-        last_num = int(last_cert.certificate_number_part)
-        return f"{last_num + 1:05d}"
+        """Номер, который получит следующий сертификат (без резервирования)"""
+        return f"{NumberSequence.peek(cls.CERTIFICATE_NUMBER_SEQUENCE, cls._last_used_number):05d}"
+
+    @classmethod
+    def allocate_numbers(cls, count=1):
+        """Резервирует блок номеров, например для массового импорта"""
+        numbers = NumberSequence.allocate(cls.CERTIFICATE_NUMBER_SEQUENCE, count, initial=cls._last_used_number)
+        return [f"{number:05d}" for number in numbers]
     
     def needs_notification(self):
         if not self.notifications_enabled:
@@ -135,15 +227,34 @@ class Certificate(models.Model):
                 return 'inspection_failed'
         
         return 'active'
+
+    def calculate_next_status_change(self, today=None):
+        """Ближайшая дата, в которую статус может измениться без редактирования сертификата"""
+        today = today or timezone.now().date()
+        one_day = timedelta(days=1)
+        candidates = []
+
+        for inspection_date, inspection_status in (
+            (self.first_inspection_date, self.first_inspection_status),
+            (self.second_inspection_date, self.second_inspection_status),
+        ):
+            if not inspection_date:
+                continue
+            if inspection_status == 'pending':
+                # Просроченная инспекция должна быть обработана, даже если дата уже прошла
+                candidates.append(inspection_date + one_day)
+            elif inspection_status == 'failed' and inspection_date + one_day > today:
+                candidates.append(inspection_date + one_day)
+
+        if self.expiry_date + one_day > today:
+            candidates.append(self.expiry_date + one_day)
+
+        return min(candidates) if candidates else None
     
     def _delete_file_if_exists(self, file_field):
-        """Безопасное удаление файла"""
+        """Планирует удаление файла фоновой очисткой медиа"""
         if file_field:
-            try:
-                if os.path.isfile(file_field.path):
-                    os.remove(file_field.path)
-            except (ValueError, OSError) as e:
-                logger.warning(f"Не удалось удалить файл {file_field}: {e}")
+            PendingFileDeletion.schedule([file_field.name])
     
     def _handle_file_clearing(self):
         """Обработка очистки файлов"""
@@ -259,123 +370,318 @@ class Certificate(models.Model):
             print(f"Ошибка при генерации QR-кода: {e}")
             return False
     
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        
+    def fill_derived_fields(self, is_new):
+        """Вычисляемые поля, которые save() заполняет перед записью; используется и массовым импортом"""
         # Устанавливаем название стандарта
         if not self.iso_standard_name and self.iso_standard:
             self.iso_standard_name = self.iso_standard.certificate_standard_name
-        
+
         # Устанавливаем даты инспекций для новых сертификатов
         if is_new:
             self.first_inspection_date = self.start_date + relativedelta(years=1)
             self.second_inspection_date = self.start_date + relativedelta(years=2)
-        
+
+        # Полный номер хранится в таблице, чтобы не обращаться к стандарту при каждом выводе
+        self.full_certificate_number = self.build_full_certificate_number()
+
         # Обновляем статус
         self.status = self.calculate_status()
+        self.next_status_change_on = self.calculate_next_status_change()
+
+    def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        
+        # Номер выдается счетчиком, если он не указан вручную
+        if is_new and not self.certificate_number_part:
+            self.certificate_number_part = self.allocate_numbers()[0]
+        elif is_new and self.certificate_number_part.isdigit():
+            NumberSequence.advance_to(self.CERTIFICATE_NUMBER_SEQUENCE, int(self.certificate_number_part))
+
+        self.fill_derived_fields(is_new)
         
         # Обрабатываем очистку файлов
         self._handle_file_clearing()
         
+        # Счетчик номеров аудита меняет только allocate_audit_numbers через UPDATE:
+        # значение в памяти могло устареть, и его запись откатила бы счетчик
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = [name for name in update_fields if name != 'audit_sequence']
+
         # Сохраняем объект
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if not is_new and update_fields is None and not kwargs.get('force_insert'):
+                # Полное сохранение записывает текущее значение счетчика; строка блокируется
+                # до конца сохранения, чтобы параллельное резервирование номеров не потерялось.
+                # Если строки еще нет (явный pk, загрузка фикстур), сохранение создаст ее как обычно
+                current = Certificate.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'audit_sequence', flat=True).first()
+                if current is not None:
+                    self.audit_sequence = current
+            super().save(*args, **kwargs)
         
         # Генерируем QR-код для новых сертификатов или если он отсутствует
         if is_new or not self.qr_code:
             if self._generate_qr_code():
                 super().save(update_fields=['qr_code'])
-    def delete(self, *args, **kwargs):
-        """Удаление сертификата с очисткой всех связанных файлов"""
-        # Удаление файлов сертификата
-        self._delete_file_if_exists(self.file1)
-        self._delete_file_if_exists(self.file1_psd)
-        self._delete_file_if_exists(self.file2)
-        self._delete_file_if_exists(self.file2_psd)
-        self._delete_file_if_exists(self.file3)
-        self._delete_file_if_exists(self.qr_code)
-        
-
-        # Удаление файлов аудиторов
-        for auditor in self.auditors.all():
-            auditor.delete()  # Это вызовет метод delete() аудитора
-
-        # Удаление пустых папок
-        self._remove_empty_folders()
-
-        super().delete(*args, **kwargs)
+    def allocate_audit_numbers(self, count=1):
+        """Атомарно резервирует count номеров аудита этого сертификата"""
+        with transaction.atomic():
+            Certificate.objects.filter(pk=self.pk).update(audit_sequence=F('audit_sequence') + count)
+            self.audit_sequence = Certificate.objects.filter(pk=self.pk).values_list('audit_sequence', flat=True).get()
+        iso_code = self.iso_standard.certificate_number_prefix
+        first = self.audit_sequence - count + 1
+        return [f"№AUD.{number:02d}{iso_code}" for number in range(first, self.audit_sequence + 1)]
 
-    def _remove_empty_folders(self):
-        """Удаление пустых папок"""
-        folders = ['certificates', 'permissions', 'audit_files', 'qr_codes', 'audit_images']
-        for folder in folders:
-            folder_path = os.path.join(settings.MEDIA_ROOT, folder)
-            try:
-                if os.path.exists(folder_path) and not os.listdir(folder_path):
-                    os.rmdir(folder_path)
-            except OSError as e:
-                logger.warning(f"Не удалось удалить папку {folder_path}: {e}")
+    def assign_audit_numbers(self, auditors):
+        """Присваивает номера всем аудиторам без номера одним резервированием"""
+        unnumbered = [auditor for auditor in auditors if not auditor.audit_number]
+        if unnumbered:
+            for auditor, number in zip(unnumbered, self.allocate_audit_numbers(len(unnumbered))):
+                auditor.audit_number = number
+        return unnumbered
 
     def generate_audit_number(self):
         """Генерация номера аудита"""
-        audits_count = self.auditors.count()
-        iso_code = self.iso_standard.certificate_number_prefix
-        return f"№AUD.{audits_count + 1:02d}{iso_code}"
+        return self.allocate_audit_numbers()[0]
     
     class Meta:
         verbose_name = 'Сертификат'
         verbose_name_plural = 'Сертификаты'
         ordering = ['-created_at']
+        indexes = [
+            # Статистика, sitemap и обновление статусов
+            models.Index(fields=['status', 'expiry_date'], name='cert_status_expiry_idx'),
+            # Отбор кандидатов для уведомлений
+            models.Index(fields=['notifications_enabled', 'expiry_date'], name='cert_notify_expiry_idx'),
+            models.Index(fields=['notifications_enabled', 'first_inspection_date'], name='cert_notify_first_insp_idx'),
+            models.Index(fields=['notifications_enabled', 'second_inspection_date'], name='cert_notify_second_insp_idx'),
+            # Списки, упорядоченные по дате создания
+            models.Index(fields=['-created_at'], name='cert_created_idx'),
+        ]
 
 
 class Auditor(models.Model):
     certificate = models.ForeignKey(Certificate, on_delete=models.CASCADE, related_name='auditors')
     full_name = models.CharField(max_length=255, verbose_name="ФИО аудитора")
-    audit_file = models.FileField(upload_to='audit_files/', null=True, blank=True, verbose_name="Файл аудита")
-    audit_file_psd = models.FileField(upload_to='audit_files/', null=True, blank=True, verbose_name="Файл аудита (PSD)")
+    audit_file = models.FileField(upload_to='audit_files/', storage=generated_documents_storage, null=True, blank=True, verbose_name="Файл аудита")
+    audit_file_psd = models.FileField(upload_to='audit_files/', storage=generated_documents_storage, null=True, blank=True, verbose_name="Файл аудита (PSD)")
     audit_number = models.CharField(max_length=20, blank=True, verbose_name="Номер аудита")
-    generated_audit_image = models.ImageField(upload_to='audit_images/', blank=True, null=True, verbose_name="Сгенерированное изображение аудита")
+    generated_audit_image = models.ImageField(upload_to='audit_images/', storage=generated_documents_storage, blank=True, null=True, verbose_name="Сгенерированное изображение аудита")
 
     def __str__(self):
         return f"{self.full_name} - {self.certificate.full_certificate_number}"
 
     def _delete_file_if_exists(self, file_field):
-        """Безопасное удаление файла"""
+        """Планирует удаление файла фоновой очисткой медиа"""
         if file_field:
-            try:
-                if os.path.isfile(file_field.path):
-                    os.remove(file_field.path)
-            except (ValueError, OSError) as e:
-                logger.warning(f"Не удалось удалить файл {file_field}: {e}")
+            PendingFileDeletion.schedule([file_field.name])
 
     def save(self, *args, **kwargs):
         if not self.audit_number:
             self.audit_number = self.certificate.generate_audit_number()
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        """Удаление аудитора с очисткой файлов"""
-        self._delete_file_if_exists(self.audit_file)
-        self._delete_file_if_exists(self.audit_file_psd)
-        self._delete_file_if_exists(self.generated_audit_image)
-        super().delete(*args, **kwargs)
-
     class Meta:
         verbose_name = 'Аудитор'
         verbose_name_plural = 'Аудиторы'
         ordering = ['full_name']
 
 
-# Сигналы для автоматической очистки файлов при удалении
+class MaintenanceRun(models.Model):
+    """Отметка об обработке диапазона id фоновой задачей за конкретную дату"""
+    STATUS_CHOICES = [
+        ('started', 'Выполняется'),
+        ('done', 'Завершено'),
+    ]
+
+    task_name = models.CharField('Задача', max_length=100)
+    run_date = models.DateField('Дата запуска')
+    chunk_start = models.BigIntegerField('Начало диапазона id')
+    chunk_end = models.BigIntegerField('Конец диапазона id')
+    status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default='started')
+    result = models.IntegerField('Результат', default=0)
+    started_at = models.DateTimeField('Начало', auto_now_add=True)
+    finished_at = models.DateTimeField('Окончание', null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.task_name} {self.run_date} [{self.chunk_start}-{self.chunk_end}]"
+
+    class Meta:
+        verbose_name = 'Запуск фоновой задачи'
+        verbose_name_plural = 'Запуски фоновых задач'
+        ordering = ['-run_date', 'task_name', 'chunk_start']
+        constraints = [
+            models.UniqueConstraint(fields=['task_name', 'run_date', 'chunk_start'],
+                                    name='unique_maintenance_chunk_per_day'),
+        ]
+
+
+class ImportRecord(models.Model):
+    """Журнал импорта справочников из файлов: по хешу файла повторный импорт пропускается"""
+    kind = models.CharField('Тип импорта', max_length=50)
+    file_name = models.CharField('Файл', max_length=255)
+    file_hash = models.CharField('SHA-256 файла', max_length=64)
+    rows = models.PositiveIntegerField('Строк в файле', default=0)
+    created = models.PositiveIntegerField('Создано', default=0)
+    updated = models.PositiveIntegerField('Обновлено', default=0)
+    unchanged = models.PositiveIntegerField('Без изменений', default=0)
+    errors = models.PositiveIntegerField('Ошибок', default=0)
+    imported_at = models.DateTimeField('Дата импорта', auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.file_name} ({self.imported_at:%d.%m.%Y %H:%M})"
+
+    @classmethod
+    def last_hash(cls, kind):
+        return cls.objects.filter(kind=kind).order_by('-imported_at', '-pk').values_list('file_hash', flat=True).first()
+
+    class Meta:
+        verbose_name = 'Импорт из файла'
+        verbose_name_plural = 'Импорт из файлов'
+        ordering = ['-imported_at']
+        indexes = [
+            models.Index(fields=['kind', '-imported_at'], name='import_kind_idx'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """Исходящее уведомление, ожидающее отправки фоновым обработчиком"""
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Отправлено'),
+        ('dead', 'Не доставлено'),
+        ('digest', 'Ожидает включения в сводку'),
+        ('digested', 'Включено в сводку'),
+    ]
+
+    RECIPIENT_TYPE_CHOICES = [
+        ('admin', 'Администратор'),
+        ('client', 'Клиент'),
+    ]
+
+    certificate = models.ForeignKey(Certificate, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='notifications', verbose_name='Сертификат')
+    recipient_type = models.CharField('Тип получателя', max_length=10, choices=RECIPIENT_TYPE_CHOICES)
+    notification_type = models.CharField('Тип уведомления', max_length=30)
+    from_email = models.EmailField('Отправитель')
+    recipient = models.EmailField('Получатель')
+    subject = models.CharField('Тема', max_length=255)
+    body = models.TextField('Текст письма')
+    dedup_key = models.CharField('Ключ дедупликации', max_length=255, unique=True)
+    status = models.CharField('Статус', max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField('Попыток отправки', default=0)
+    next_attempt_at = models.DateTimeField('Следующая попытка', default=timezone.now)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    sent_at = models.DateTimeField('Дата отправки', null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.notification_type} -> {self.recipient} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Исходящее уведомление'
+        verbose_name_plural = 'Исходящие уведомления'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+
+class PendingFileDeletion(models.Model):
+    """Файл, ожидающий удаления фоновой очисткой медиа"""
+    name = models.CharField('Путь в хранилище', max_length=500, unique=True)
+    attempts = models.PositiveSmallIntegerField('Попыток удаления', default=0)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def schedule(cls, names):
+        """
+        Записывает файлы в очередь на удаление.
+
+        Запись идет в той же транзакции, что и удаление объекта: при откате
+        файлы остаются на месте, а после фиксации их удалит фоновая задача.
+        """
+        names = {name for name in names if name}
+        if names:
+            cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+
+    class Meta:
+        verbose_name = 'Файл на удаление'
+        verbose_name_plural = 'Файлы на удаление'
+        ordering = ['created_at']
+
+
+def _file_names(instance):
+    return [getattr(instance, field.name).name for field in instance._meta.fields
+            if isinstance(field, models.FileField) and getattr(instance, field.name)]
+
+
+def _file_field_names(model):
+    return [field.name for field in model._meta.fields if isinstance(field, models.FileField)]
+
+
+# Сигналы срабатывают и при удалении из списка в админке, и при каскадном удалении аудиторов
 @receiver(pre_delete, sender=Certificate)
 def certificate_delete_files(sender, instance, **kwargs):
-    """Сигнал для удаления файлов при удалении сертификата"""
-    # Этот сигнал можно использовать как дополнительную защиту
-    # если метод delete() по какой-то причине не сработает
-    pass
+    """Планирует удаление файлов удаляемого сертификата"""
+    PendingFileDeletion.schedule(_file_names(instance))
 
 @receiver(pre_delete, sender=Auditor)
 def auditor_delete_files(sender, instance, **kwargs):
-    """Сигнал для удаления файлов при удалении аудитора"""
-    # Этот сигнал можно использовать как дополнительную защиту
-    # если метод delete() по какой-то причине не сработает
-    pass    
\ No newline at end of file
+    """Планирует удаление файлов удаляемого аудитора"""
+    PendingFileDeletion.schedule(_file_names(instance))
+
+
+# Стандарт и аудитор выводятся на публичных страницах, но не меняют updated_at сертификата
+@receiver([post_save, post_delete], sender=ISOStandard)
+@receiver([post_save, post_delete], sender=Auditor)
+def invalidate_detail_pages_on_change(sender, **kwargs):
+    invalidate_detail_pages()
+
+
+@receiver(pre_save, sender=Certificate)
+@receiver(pre_save, sender=Auditor)
+def remember_stored_file_names(sender, instance, update_fields=None, raw=False, **kwargs):
+    """
+    Запоминает имена файлов, записанные в базе до сохранения.
+
+    Превью нужны только для новых файлов: сохранение, которое не меняет
+    файловые поля (статус, update_fields без файлов), их не создает.
+    """
+    fields = _file_field_names(sender)
+    if update_fields is not None:
+        fields = [name for name in fields if name in update_fields]
+    if raw or not fields:
+        instance._stored_file_names = {}
+        return
+    stored = None
+    if instance.pk is not None:
+        stored = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._stored_file_names = stored or dict.fromkeys(fields)
+
+
+def _generate_thumbnails(names):
+    from .tasks import generate_thumbnails_task
+    try:
+        generate_thumbnails_task.delay(names)
+    except Exception as e:
+        # Без брокера задача выполняется сразу; ошибка превью не должна ломать сохранение
+        logger.warning(f"Не удалось создать превью {', '.join(names)}: {e}")
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_save, sender=Auditor)
+def generate_thumbnails_on_save(sender, instance, **kwargs):
+    """Ставит создание превью новых изображений в очередь после фиксации транзакции"""
+    # Имена сравниваются после сохранения: поле получает окончательное имя файла при записи в хранилище
+    stored = getattr(instance, '_stored_file_names', {})
+    names = [getattr(instance, field).name for field, name in stored.items()
+             if getattr(instance, field) and getattr(instance, field).name != name]
+    names = [name for name in names if is_image(name)]
+    if names:
+        transaction.on_commit(lambda: _generate_thumbnails(names))
@@ -0,0 +1,157 @@
+"""
+Сжатие PNG сгенерированных документов.
+
+generate_*_image сохраняют результат psd.composite() с настройками PNG по
+умолчанию. Фоновая задача после генерации перекодирует файл без потерь:
+убирает метаданные и непрозрачный альфа-канал, переводит изображения
+не более чем из 256 цветов в палитру и сжимает с PNG_COMPRESS_LEVEL.
+При PNG_QUANTIZE документы, почти целиком состоящие из немногих цветов,
+переводятся в адаптивную палитру с потерями.
+
+Новый файл сохраняется под новым именем (хранилище может адресовать файлы
+по содержимому), поле обновляется только если за это время не изменилось,
+а старый файл удаляет фоновая очистка медиа.
+"""
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from io import BytesIO
+from .models import Certificate, Auditor, PendingFileDeletion
+import logging
+
+logger = logging.getLogger(__name__)
+
+# PNG-документы, которые создает генерация
+DOCUMENT_FIELDS = {
+    Certificate: ['file1', 'file2'],
+    Auditor: ['audit_file'],
+}
+
+# Не больше стольких цветов считается при проверке «почти плоского» документа
+MAX_COUNTED_COLORS = 1 << 16
+
+
+def _palette_image(image):
+    """Палитровое изображение без потерь, если в RGB-изображении не больше 256 цветов, иначе None"""
+    from PIL import Image
+
+    if image.mode != 'RGB':
+        return None
+    if image.getcolors(256) is None:
+        return None
+    # Если цветов не больше, чем мест в палитре, MEDIANCUT сохраняет их точно
+    return image.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+
+
+def _quantized_image(image, coverage):
+    """
+    Адаптивная палитра из 256 цветов для «почти плоского» документа или None.
+
+    Документ считается почти плоским, если 256 самых частых цветов покрывают
+    не меньше coverage пикселей: остальное - сглаживание краев текста.
+    """
+    from PIL import Image
+
+    colors = image.getcolors(MAX_COUNTED_COLORS)
+    if colors is None:
+        return None
+    top = sum(count for count, _ in sorted(colors, reverse=True)[:256])
+    if top < coverage * image.width * image.height:
+        return None
+    method = Image.Quantize.FASTOCTREE if image.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+    return image.quantize(colors=256, method=method, dither=Image.Dither.NONE)
+
+
+def optimize_png(data, compress_level=None, quantize=None):
+    """Перекодирует PNG data; возвращает новые байты (могут оказаться не меньше исходных)"""
+    from PIL import Image
+
+    compress_level = getattr(settings, 'PNG_COMPRESS_LEVEL', 9) if compress_level is None else compress_level
+    quantize = getattr(settings, 'PNG_QUANTIZE', False) if quantize is None else quantize
+
+    image = Image.open(BytesIO(data))
+    image.load()
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        image = image.convert('RGBA')
+    elif image.mode in ('LA', 'P'):
+        image = image.convert('RGBA' if image.mode == 'LA' or 'transparency' in image.info else 'RGB')
+    if image.mode == 'RGBA' and image.getextrema()[3] == (255, 255):
+        # Полностью непрозрачный альфа-канал только увеличивает файл
+        image = image.convert('RGB')
+    # Метаданные (текстовые блоки, ICC, EXIF, время) не сохраняются
+    image.info = {}
+
+    optimized = _palette_image(image)
+    if optimized is None and quantize:
+        optimized = _quantized_image(image, getattr(settings, 'PNG_QUANTIZE_COVERAGE', 0.95))
+    if optimized is not None:
+        image = optimized
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=getattr(settings, 'PNG_OPTIMIZE', True),
+               compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def optimize_document(instance, field_name, dry_run=False, **options):
+    """
+    Сжимает PNG в поле field_name объекта instance.
+
+    Возвращает (имя файла, байт до, байт после) или None, если поле пустое или не PNG.
+    Файл заменяется, только если стал меньше.
+    """
+    file = getattr(instance, field_name)
+    name = file.name
+    if not name or not name.lower().endswith('.png'):
+        return None
+    try:
+        with file.storage.open(name, 'rb') as source:
+            data = source.read()
+    except FileNotFoundError:
+        logger.info(f"Нет файла для сжатия: {name}")
+        return None
+
+    optimized = optimize_png(data, **options)
+    if len(optimized) >= len(data):
+        return name, len(data), len(data)
+    if dry_run:
+        return name, len(data), len(optimized)
+
+    field = file.field
+    new_name = file.storage.save(field.generate_filename(instance, name.rsplit('/', 1)[-1]), ContentFile(optimized))
+    with transaction.atomic():
+        # Условное обновление: файл, замененный за время сжатия, не перезаписывается
+        updated = type(instance).objects.filter(pk=instance.pk, **{field_name: name}).update(**{field_name: new_name})
+        # Очистка медиа удалит файл, только если на него больше нет ссылок
+        PendingFileDeletion.schedule([name] if updated else [new_name])
+    if not updated:
+        return name, len(data), len(data)
+    setattr(instance, field_name, new_name)
+    return name, len(data), len(optimized)
+
+
+def optimize_documents(instances, dry_run=False, **options):
+    """Сжимает PNG-документы объектов; возвращает список (имя, до, после) и пишет экономию в лог"""
+    report = []
+    for instance in instances:
+        for field_name in DOCUMENT_FIELDS[type(instance)]:
+            try:
+                result = optimize_document(instance, field_name, dry_run=dry_run, **options)
+            except Exception as e:
+                logger.warning(f"Не удалось сжать {getattr(instance, field_name).name}: {e}")
+                continue
+            if result is None:
+                continue
+            name, before, after = result
+            logger.info(f"Сжатие {name}: {before} -> {after} байт (-{(before - after) * 100 / before:.1f}%)")
+            report.append(result)
+    return report
+
+
+def enqueue_optimization(certificate_ids=(), auditor_ids=()):
+    """Ставит сжатие документов в очередь после фиксации транзакции"""
+    if not getattr(settings, 'PNG_OPTIMIZATION_ENABLED', True) or not (certificate_ids or auditor_ids):
+        return
+    from .tasks import optimize_documents_task
+    certificate_ids, auditor_ids = list(certificate_ids), list(auditor_ids)
+    transaction.on_commit(lambda: optimize_documents_task.delay(certificate_ids, auditor_ids))
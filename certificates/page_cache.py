@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+GENERATION_KEY = 'detail_pages:generation'
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def invalidate_detail_pages():
+    """
+    Сбрасывает кэш всех публичных страниц сертификатов.
+
+    Вызывается при изменениях, которые не меняют updated_at сертификата:
+    правка стандарта ISO, аудитора, пересчет номеров через UPDATE.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def detail_cache_key(request, kind, certificate, auditor=None):
+    # Страница содержит абсолютную ссылку на себя, поэтому схема и хост входят в ключ
+    return ':'.join(str(part) for part in (
+        'detail', _generation(), kind, request.build_absolute_uri('/'), certificate.pk,
+        auditor.pk if auditor else 0, certificate.updated_at.timestamp(),
+    ))
+
+
+def cached_detail_page(request, kind, template_name, context, certificate, auditor=None):
+    """
+    Отдает публичную страницу сертификата из кэша или рендерит и кэширует ее.
+
+    Ключ включает updated_at сертификата, поэтому сохранение сертификата
+    само делает старую запись недоступной; остальные изменения сбрасывает
+    invalidate_detail_pages.
+    """
+    key = detail_cache_key(request, kind, certificate, auditor)
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(template_name, context, request)
+        cache.set(key, html, getattr(settings, 'DETAIL_PAGE_CACHE_SECONDS', 3600))
+    return HttpResponse(html)
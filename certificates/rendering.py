@@ -0,0 +1,339 @@
+"""
+Генерация изображений документов и QR-кодов.
+
+Модуль тянет за собой psd_tools, qrcode, Pillow и NumPy, поэтому импортируется
+только при первой генерации: остальной код обращается к нему через обертки
+в certificates.utils.
+"""
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.urls import reverse
+from io import BytesIO
+from PIL import Image
+from psd_tools import PSDImage
+import copy
+import functools
+import logging
+import os
+import qrcode
+
+logger = logging.getLogger(__name__)
+
+PSD_TEMPLATES = ['certificate_background.psd', 'permission_background.psd', 'audit_background.psd']
+
+
+def psd_template_path(filename):
+    return os.path.join(settings.BASE_DIR, 'static', 'certificates', 'img', filename)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_psd_template(path, mtime):
+    # mtime в ключе: замененный на диске шаблон разбирается заново
+    return PSDImage.open(path)
+
+
+def load_psd_template(filename):
+    """
+    Возвращает разобранный PSD-шаблон или None, если файла нет.
+
+    Шаблон разбирается один раз на процесс; генерация меняет текстовые слои,
+    поэтому каждый вызов получает свою копию.
+    """
+    path = psd_template_path(filename)
+    if not os.path.exists(path):
+        logger.error(f"PSD template not found: {path}")
+        return None
+    return copy.deepcopy(_parse_psd_template(path, os.path.getmtime(path)))
+
+
+def create_qr_with_logo(data, logo_path=None, transparent_bg=True):
+    """Создает QR-код с логотипом и прозрачным фоном"""
+    try:
+        # Создание QR-кода
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_H,  # Высокий уровень коррекции для логотипа
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        
+        # Создание изображения QR-кода
+        if transparent_bg:
+            qr_img = qr.make_image(fill_color="black", back_color=None)
+            qr_img = qr_img.convert("RGBA")
+            # Делаем белый фон прозрачным
+            datas = qr_img.getdata()
+            newData = []
+            for item in datas:
+                if item[0] == 255 and item[1] == 255 and item[2] == 255:  # белый цвет
+                    newData.append((255, 255, 255, 0))  # прозрачный
+                else:
+                    newData.append(item)
+            qr_img.putdata(newData)
+        else:
+            qr_img = qr.make_image(fill_color="black", back_color="white")
+            qr_img = qr_img.convert("RGBA")
+        
+        # Добавление логотипа если указан путь
+        if logo_path and os.path.exists(logo_path):
+            try:
+                logo = Image.open(logo_path)
+                logo = logo.convert("RGBA")
+                
+                # Размер логотипа (не более 30% от размера QR-кода)
+                qr_width, qr_height = qr_img.size
+                logo_size = min(qr_width, qr_height) // 4
+                logo = logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
+                
+                # Создание белого фона для логотипа
+                logo_bg = Image.new('RGBA', (logo_size + 20, logo_size + 20), (255, 255, 255, 255))
+                logo_bg.paste(logo, (10, 10), logo)
+                
+                # Позиционирование в центре
+                logo_pos = ((qr_width - logo_bg.size[0]) // 2, (qr_height - logo_bg.size[1]) // 2)
+                qr_img.paste(logo_bg, logo_pos, logo_bg)
+                
+            except Exception as e:
+                logger.error(f"Не удалось добавить логотип: {str(e)}")
+
+        return qr_img
+        
+    except Exception as e:
+        logger.error(f"Ошибка при создании QR-кода с логотипом: {str(e)}")
+        return None
+
+def generate_certificate_image(certificate, file1_cleared=False, file1_psd_cleared=False):
+    """Генерирует изображения сертификата (PNG и PSD)"""
+    if file1_cleared and file1_psd_cleared:
+        return None
+
+    result = {}
+    
+    try:
+        if not file1_cleared or not file1_psd_cleared:
+            psd = load_psd_template('certificate_background.psd')
+            if psd is None:
+                return None
+            
+            # Генерация QR-кода с логотипом
+            url = settings.SITE_URL + reverse('certificate_detail', args=[certificate.id])
+            logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
+            qr_img = create_qr_with_logo(url, logo_path, transparent_bg=True)
+            
+            if not qr_img:
+                # Fallback к обычному QR-коду
+                qr = qrcode.QRCode(version=1, box_size=10, border=5)
+                qr.add_data(url)
+                qr.make(fit=True)
+                qr_img = qr.make_image(fill_color="black", back_color="white")
+            
+            replace_dict = {
+                '%%CERTIFICATE_NUMBER%%': certificate.full_certificate_number,
+                '%%ORGANIZATION_NAME%%': certificate.name,
+                '%%INN%%': certificate.inn,
+                '%%ADDRESS%%': certificate.address,
+                '%%QUALITY_MANAGEMENT_SYSTEM%%': certificate.quality_management_system,
+                '%%ISO_STANDARD%%': certificate.iso_standard_name or str(certificate.iso_standard),
+                '%%START_DATE%%': certificate.start_date.strftime('%d.%m.%Y'),
+                '%%EXPIRY_DATE%%': certificate.expiry_date.strftime('%d.%m.%Y'),
+            }
+            
+            # Обработка текстовых слоев
+            for layer in psd:
+                if layer.kind == 'type':
+                    try:
+                        if hasattr(layer, 'text') and layer.text is not None:
+                            original_text = layer.text.value
+                            new_text = original_text
+                            for key, value in replace_dict.items():
+                                if key in original_text:
+                                    new_text = new_text.replace(key, str(value))
+                            
+                            if new_text != original_text:
+                                layer.text.value = new_text
+                                logger.info(f"Successfully updated text in layer: {layer.name}")
+                    except Exception as e:
+                        logger.error(f"Error updating text in layer {layer.name}: {str(e)}")
+                
+                elif layer.name == '%%QR%%':
+                    try:
+                        # Логика для замены QR-кода требует дополнительной реализации
+                        logger.info("QR code layer found")
+                    except Exception as e:
+                        logger.error(f"Error adding QR code: {str(e)}")
+
+            # Сохранение PSD
+            if not file1_psd_cleared:
+                psd_buffer = BytesIO()
+                psd.save(psd_buffer)
+                psd_buffer.seek(0)
+                result['psd'] = ContentFile(psd_buffer.getvalue(), name=f'certificate_{certificate.id}.psd')
+
+            # Сохранение PNG
+            if not file1_cleared:
+                png_image = psd.composite()
+                png_buffer = BytesIO()
+                png_image.save(png_buffer, format='PNG')
+                png_buffer.seek(0)
+                result['png'] = ContentFile(png_buffer.getvalue(), name=f'certificate_{certificate.id}.png')
+
+    except Exception as e:
+        logger.error(f"Error generating certificate image: {str(e)}")
+        return None
+
+    return result
+
+def generate_permission_image(certificate, file2_cleared=False, file2_psd_cleared=False):
+    """Генерирует изображения разрешения (PNG и PSD)"""
+    if file2_cleared and file2_psd_cleared:
+        return None
+
+    result = {}
+    
+    try:
+        if not file2_cleared or not file2_psd_cleared:
+            psd = load_psd_template('permission_background.psd')
+            if psd is None:
+                return None
+            
+            # Генерация QR-кода с логотипом
+            url = settings.SITE_URL + reverse('permission_detail', args=[certificate.id])
+            logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
+            qr_img = create_qr_with_logo(url, logo_path, transparent_bg=True)
+            
+            if not qr_img:
+                # Fallback к обычному QR-коду
+                qr = qrcode.QRCode(version=1, box_size=10, border=5)
+                qr.add_data(url)
+                qr.make(fit=True)
+                qr_img = qr.make_image(fill_color="black", back_color="white")
+            
+            replace_dict = {
+                '%%CERTIFICATE_NUMBER%%': certificate.full_certificate_number,
+                '%%ORGANIZATION_NAME%%': certificate.name,
+                '%%INN%%': certificate.inn,
+                '%%ADDRESS%%': certificate.address,
+            }
+            
+            # Обработка текстовых слоев
+            for layer in psd:
+                if layer.kind == 'type':
+                    try:
+                        if hasattr(layer, 'text') and layer.text is not None:
+                            original_text = layer.text.value
+                            new_text = original_text
+                            for key, value in replace_dict.items():
+                                if key in original_text:
+                                    new_text = new_text.replace(key, str(value))
+                            
+                            if new_text != original_text:
+                                layer.text.value = new_text
+                                logger.info(f"Successfully updated text in layer: {layer.name}")
+                    except Exception as e:
+                        logger.error(f"Error updating text in layer {layer.name}: {str(e)}")
+                
+                elif layer.name == '%%QR%%':
+                    try:
+                        logger.info("QR code layer found for permission")
+                    except Exception as e:
+                        logger.error(f"Error adding QR code: {str(e)}")
+
+            # Сохранение PSD
+            if not file2_psd_cleared:
+                psd_buffer = BytesIO()
+                psd.save(psd_buffer)
+                psd_buffer.seek(0)
+                result['psd'] = ContentFile(psd_buffer.getvalue(), name=f'permission_{certificate.id}.psd')
+
+            # Сохранение PNG
+            if not file2_cleared:
+                png_image = psd.composite()
+                png_buffer = BytesIO()
+                png_image.save(png_buffer, format='PNG')
+                png_buffer.seek(0)
+                result['png'] = ContentFile(png_buffer.getvalue(), name=f'permission_{certificate.id}.png')
+
+    except Exception as e:
+        logger.error(f"Error generating permission image: {str(e)}")
+        return None
+
+    return result
+
+def generate_audit_image(certificate, auditor, audit_number, audit_file_cleared=False, audit_file_psd_cleared=False):
+    """Генерирует изображения аудита (PNG и PSD)"""
+    if audit_file_cleared and audit_file_psd_cleared:
+        return None
+
+    result = {}
+    
+    try:
+        if not audit_file_cleared or not audit_file_psd_cleared:
+            psd = load_psd_template('audit_background.psd')
+            if psd is None:
+                return None
+            
+            # Генерация QR-кода с логотипом
+            url = settings.SITE_URL + reverse('audit_detail', args=[certificate.id, auditor.id])
+            logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
+            qr_img = create_qr_with_logo(url, logo_path, transparent_bg=True)
+            
+            if not qr_img:
+                # Fallback к обычному QR-коду
+                qr = qrcode.QRCode(version=1, box_size=10, border=5)
+                qr.add_data(url)
+                qr.make(fit=True)
+                qr_img = qr.make_image(fill_color="black", back_color="white")
+            
+            replace_dict = {
+                '%%AUDIT_NUMBER%%': audit_number,
+                '%%AUDIT_NAME%%': auditor.full_name,
+                '%%ISO_STANDARD%%': str(certificate.iso_standard),
+                '%%START_DATE%%': certificate.start_date.strftime('%d.%m.%Y'),
+                '%%EXPIRY_DATE%%': certificate.expiry_date.strftime('%d.%m.%Y'),
+            }
+            
+            # Обработка текстовых слоев
+            for layer in psd:
+                if layer.kind == 'type':
+                    try:
+                        if hasattr(layer, 'text') and layer.text is not None:
+                            original_text = layer.text.value
+                            new_text = original_text
+                            for key, value in replace_dict.items():
+                                if key in original_text:
+                                    new_text = new_text.replace(key, str(value))
+                            
+                            if new_text != original_text:
+                                layer.text.value = new_text
+                                logger.info(f"Successfully updated text in layer: {layer.name}")
+                    except Exception as e:
+                        logger.error(f"Error updating text in layer {layer.name}: {str(e)}")
+                
+                elif layer.name == '%%QR%%':
+                    try:
+                        logger.info("QR code layer found for audit")
+                    except Exception as e:
+                        logger.error(f"Error adding QR code: {str(e)}")
+
+            # Сохранение PSD
+            if not audit_file_psd_cleared:
+                psd_buffer = BytesIO()
+                psd.save(psd_buffer)
+                psd_buffer.seek(0)
+                result['psd'] = ContentFile(psd_buffer.getvalue(), name=f'audit_{certificate.id}_{auditor.id}.psd')
+
+            # Сохранение PNG
+            if not audit_file_cleared:
+                png_image = psd.composite()
+                png_buffer = BytesIO()
+                png_image.save(png_buffer, format='PNG')
+                png_buffer.seek(0)
+                result['png'] = ContentFile(png_buffer.getvalue(), name=f'audit_{certificate.id}_{auditor.id}.png')
+
+    except Exception as e:
+        logger.error(f"Error generating audit image: {str(e)}")
+        return None
+
+    return result
@@ -0,0 +1,186 @@
+"""
+Уменьшение изображений до произвольной ширины с кэшем на локальном диске.
+
+Результат хранится в RESIZE_CACHE_DIR под ключом из пути, времени изменения
+исходного файла, ширины и формата: замена файла дает новый ключ, а каждая
+пара (файл, ширина) уменьшается один раз. Размер кэша ограничен
+RESIZE_CACHE_MAX_BYTES; при переполнении удаляются давно не запрошенные файлы.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+from io import BytesIO
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+# Доля максимального размера, до которой кэш очищается при переполнении
+EVICT_TARGET = 0.9
+
+_lock = threading.Lock()
+# Оценка размера кэша в этом процессе; точное значение получается при обходе каталога
+_cache_state = {'size': None, 'scanned_at': 0.0}
+
+
+def cache_dir():
+    return getattr(settings, 'RESIZE_CACHE_DIR', os.path.join(settings.BASE_DIR, 'resize_cache'))
+
+
+def output_format(name, accept=''):
+    """WebP для браузеров, которые его принимают, иначе формат исходного файла"""
+    if 'image/webp' in accept:
+        return 'webp'
+    return 'jpeg' if name.lower().endswith(('.jpg', '.jpeg')) else 'png'
+
+
+def cache_path(name, mtime, width, fmt):
+    key = hashlib.sha256(f'{name}\0{mtime}\0{width}\0{fmt}'.encode()).hexdigest()
+    return os.path.join(cache_dir(), key[:2], f'{key}.{fmt}')
+
+
+class ResizeError(Exception):
+    """Изображение не удалось уменьшить: неподдерживаемый режим или слишком большой файл"""
+
+
+def _open_for_resize(source, width):
+    from PIL import Image
+
+    image = Image.open(source)
+    if width < image.width:
+        image.draft('RGB', (width, max(1, round(image.height * width / image.width))))
+    # reduce и LANCZOS работают только с RGB(A) и L(A): палитровые (GIF, сжатые документы),
+    # 1-битные и 16-битные изображения переводятся заранее
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        has_alpha = 'transparency' in image.info or image.mode.endswith(('A', 'a'))
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def resize_image(source, width, fmt):
+    """
+    Уменьшает изображение до ширины width; изображения уже не больше width не увеличиваются.
+
+    draft декодирует JPEG сразу в уменьшенном масштабе, reduce быстро сжимает
+    в целое число раз, и только остаток уменьшается фильтром LANCZOS.
+    """
+    from PIL import Image
+
+    try:
+        image = _open_for_resize(source, width)
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            factor = image.width // (width * 2)
+            if factor >= 2:
+                image = image.reduce(factor)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            image.load()
+    except (ValueError, Image.DecompressionBombError) as e:
+        raise ResizeError(str(e)) from e
+
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    buffer = BytesIO()
+    pil_format = FORMATS[fmt][0]
+    if fmt == 'png':
+        image.save(buffer, format=pil_format, optimize=True)
+    else:
+        image.save(buffer, format=pil_format, quality=getattr(settings, 'RESIZE_QUALITY', 82))
+    return buffer.getvalue()
+
+
+def get_resized(name, width, fmt, storage=None):
+    """
+    Возвращает путь к уменьшенной копии в кэше, создавая ее при необходимости.
+
+    Обращение к файлу в кэше обновляет его время изменения: по нему
+    вытесняются давно не запрошенные копии.
+    """
+    storage = storage or default_storage
+    mtime = int(storage.get_modified_time(name).timestamp())
+    path = cache_path(name, mtime, width, fmt)
+    try:
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    with storage.open(name, 'rb') as source:
+        data = resize_image(source, width, fmt)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Запись во временный файл и переименование: параллельный запрос не увидит недописанный файл
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+    _account(len(data), path)
+    return path
+
+
+def _account(added, created):
+    max_bytes = getattr(settings, 'RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    interval = getattr(settings, 'RESIZE_CACHE_SCAN_INTERVAL', 300)
+    with _lock:
+        if _cache_state['size'] is not None:
+            _cache_state['size'] += added
+        # Каталог обходится только при возможном переполнении или раз в interval секунд:
+        # другие процессы тоже пишут в кэш, и оценка этого процесса может отставать
+        stale = time.monotonic() - _cache_state['scanned_at'] > interval
+        if _cache_state['size'] is None or _cache_state['size'] > max_bytes or stale:
+            _cache_state['size'] = evict(max_bytes, keep=created)
+            _cache_state['scanned_at'] = time.monotonic()
+
+
+def evict(max_bytes=None, keep=None):
+    """
+    Удаляет давно не запрошенные файлы, пока кэш больше max_bytes; возвращает итоговый размер.
+
+    Файл keep (только что созданный и еще не отданный) не удаляется.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    entries = []
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return 0
+    for directory in os.scandir(root):
+        if not directory.is_dir(follow_symlinks=False):
+            continue
+        for entry in os.scandir(directory.path):
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    if total <= max_bytes:
+        return total
+    target = max_bytes * EVICT_TARGET
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    logger.info(f"Кэш уменьшенных изображений: удалено {removed}, размер {total} байт")
+    return total
@@ -0,0 +1,114 @@
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Certificate
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Порядок переходов важен: сначала фиксируются просроченные инспекции,
+# затем статусы пересчитываются по тем же правилам, что и Certificate.calculate_status()
+TRANSITIONS = (
+    'first_inspection_failed',
+    'second_inspection_failed',
+    'expired',
+    'inspection_failed',
+    'active',
+)
+
+RESCHEDULE_BATCH_SIZE = 1000
+
+RESCHEDULE_FIELDS = (
+    'pk', 'expiry_date', 'first_inspection_date', 'first_inspection_status',
+    'second_inspection_date', 'second_inspection_status', 'next_status_change_on',
+)
+
+
+def _failed_inspection_q(today):
+    """Условие 'не пройден инспекционный контроль' из calculate_status()"""
+    return (
+        Q(second_inspection_date__lt=today, second_inspection_status='failed') |
+        Q(first_inspection_date__lt=today, first_inspection_status='failed')
+    )
+
+
+def _transition_updates(today):
+    """Возвращает пары (название перехода, фильтр, обновляемые поля)"""
+    failed_q = _failed_inspection_q(today)
+    return (
+        ('first_inspection_failed',
+         Q(first_inspection_date__lt=today, first_inspection_status='pending'),
+         {'first_inspection_status': 'failed'}),
+        ('second_inspection_failed',
+         Q(second_inspection_date__lt=today, second_inspection_status='pending'),
+         {'second_inspection_status': 'failed'}),
+        ('expired',
+         Q(expiry_date__lt=today) & ~Q(status='expired'),
+         {'status': 'expired'}),
+        ('inspection_failed',
+         Q(expiry_date__gte=today) & failed_q & ~Q(status='inspection_failed'),
+         {'status': 'inspection_failed'}),
+        ('active',
+         Q(expiry_date__gte=today) & ~failed_q & ~Q(status='active'),
+         {'status': 'active'}),
+    )
+
+
+def _reschedule(queryset, today):
+    """Пересчитывает next_status_change_on для обработанных сертификатов"""
+    rescheduled = 0
+    last_pk = 0
+    while True:
+        # Постраничный проход по pk: обновление колонки не сдвигает следующие страницы
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk').only(*RESCHEDULE_FIELDS)[:RESCHEDULE_BATCH_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        changed = []
+        for certificate in chunk:
+            next_change = certificate.calculate_next_status_change(today)
+            if next_change != certificate.next_status_change_on:
+                certificate.next_status_change_on = next_change
+                changed.append(certificate)
+        if changed:
+            Certificate.objects.bulk_update(changed, ['next_status_change_on'])
+            rescheduled += len(changed)
+    return rescheduled
+
+
+def refresh_statuses(today=None, dry_run=False, queryset=None, due_only=True):
+    """
+    Обновляет статусы сертификатов набором массовых UPDATE в одной транзакции.
+
+    По умолчанию обрабатываются только сертификаты, у которых наступила
+    next_status_change_on; due_only=False выполняет полный проход по реестру.
+    Возвращает словарь с количеством сертификатов по каждому переходу.
+    При dry_run=True изменения откатываются, но счетчики остаются точными.
+    """
+    today = today or timezone.now().date()
+    queryset = Certificate.objects.all() if queryset is None else queryset
+    # Пересчет читает только что обновленные строки, поэтому работает с основной базой, а не с репликой
+    queryset = queryset.using(router.db_for_write(Certificate))
+    # Связанные объекты для отображения пересчету не нужны и несовместимы с only() в _reschedule
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if due_only:
+        # Переходы не меняют next_status_change_on, поэтому выборка стабильна до пересчета
+        queryset = queryset.filter(next_status_change_on__lte=today)
+        if not queryset.exists():
+            return dict.fromkeys(TRANSITIONS, 0)
+    counts = {}
+
+    with transaction.atomic():
+        now = timezone.now()
+        for name, condition, values in _transition_updates(today):
+            counts[name] = queryset.filter(condition).update(updated_at=now, **values)
+
+        rescheduled = _reschedule(queryset, today)
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    logger.info(f"Обновление статусов на {today}{' (dry-run)' if dry_run else ''}: {counts}, "
+                f"перепланировано: {rescheduled}")
+    return counts
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, storages
+from django.http import FileResponse, HttpResponseRedirect
+import hashlib
+import os
+import posixpath
+import re
+import sys
+
+# Путь вида '<папка>/ab/cd/<sha256>.<ext>'
+CONTENT_ADDRESSED_NAME_RE = re.compile(r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[0-9a-f]{60}(_\w+)?\.\w+$')
+
+
+def is_content_addressed(name):
+    """Имя файла сформировано по хешу содержимого, и его URL можно кэшировать бессрочно"""
+    return bool(CONTENT_ADDRESSED_NAME_RE.search(name))
+
+
+def is_local_storage(storage):
+    """Хранилище лежит на локальном диске, и к файлам можно обращаться по пути"""
+    return isinstance(storage, FileSystemStorage)
+
+
+def is_s3_storage(storage):
+    """Хранилище S3 из django-storages; если модуль бэкенда не загружен, S3 не используется"""
+    s3 = sys.modules.get('storages.backends.s3')
+    return s3 is not None and isinstance(storage, s3.S3Storage)
+
+
+class ContentAddressedMixin:
+    """
+    Сохраняет файлы под именем SHA-256 их содержимого.
+
+    Одинаковое содержимое хранится один раз: повторное сохранение возвращает уже
+    существующее имя без записи. Файл, на который ссылаются несколько объектов,
+    не удаляется, пока жива хотя бы одна ссылка: перед удалением фоновая очистка
+    медиа проверяет ссылки во всех файловых полях (см. certificates.media).
+    """
+
+    def content_name(self, name, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = sha256.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name), digest[:2], digest[2:4], f'{digest}{extension}')
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        # При одновременной записи того же содержимого второй файл получит суффикс от Django
+        return super()._save(name, content)
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
+
+
+def __getattr__(name):
+    # django-storages и boto3 нужны только в режиме MEDIA_STORAGE=s3 и заметно замедляют
+    # старт воркера, поэтому класс создается при первом обращении из STORAGES
+    if name == 'ContentAddressedS3Storage':
+        from storages.backends.s3 import S3Storage
+
+        class ContentAddressedS3Storage(ContentAddressedMixin, S3Storage):
+            pass
+
+        ContentAddressedS3Storage.__qualname__ = name
+        globals()[name] = ContentAddressedS3Storage
+        return ContentAddressedS3Storage
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def generated_documents_storage():
+    """Хранилище сгенерированных документов и QR-кодов (STORAGES['generated'])"""
+    return storages['generated']
+
+
+def file_response(storage, name, as_attachment=False, filename=None):
+    """
+    Отдает файл из любого хранилища.
+
+    Для S3 при MEDIA_PRESIGNED_DOWNLOADS возвращает редирект на подписанную ссылку,
+    и файл скачивается напрямую из хранилища, минуя Django. Иначе файл
+    передается потоком по частям, без чтения в память целиком.
+    """
+    filename = filename or posixpath.basename(name)
+    if is_s3_storage(storage) and getattr(settings, 'MEDIA_PRESIGNED_DOWNLOADS', True):
+        disposition = 'attachment' if as_attachment else 'inline'
+        return HttpResponseRedirect(storage.url(name, parameters={
+            'ResponseContentDisposition': f'{disposition}; filename="{filename}"',
+        }))
+    return FileResponse(storage.open(name, 'rb'), as_attachment=as_attachment, filename=filename)
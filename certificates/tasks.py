@@ -1,6 +1,229 @@
-from celery import shared_task
-from .utils import send_notification
+from celery import shared_task, group, chord
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import Certificate, Auditor, MaintenanceRun
+from .statuses import refresh_statuses
+from .utils import (
+    enqueue_notifications, build_admin_digest, deliver_outbox, render_missing_documents, render_missing_audit_documents,
+)
+from .media import remove_empty_folders, sweep_deleted_files, all_referenced_names, scan_media_files
+from .thumbnails import generate_thumbnails, generate_thumbnails_for
+from .optimization import enqueue_optimization, optimize_documents
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, 'MAINTENANCE_CHUNK_SIZE', 500)
+
+
+def _id_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Разбивает выборку на диапазоны id фиксированной ширины.
+
+    Границы кратны chunk_size и не зависят от текущего минимального id,
+    поэтому повторный запуск за ту же дату получает те же диапазоны.
+    """
+    bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return []
+    first = bounds['first'] // chunk_size * chunk_size
+    return [(start, start + chunk_size - 1) for start in range(first, bounds['last'] + 1, chunk_size)]
+
+
+def _fan_out(task_name, chunk_task, run_date=None, callback=None):
+    """Запускает обработку реестра подзадачами по диапазонам id; callback выполняется после всех подзадач"""
+    run_date = run_date or timezone.localdate().isoformat()
+    chunks = _id_chunks(Certificate.objects.all())
+    if chunks:
+        header = group(chunk_task.s(run_date, start, end) for start, end in chunks)
+        if callback is None:
+            header.apply_async()
+        else:
+            chord(header)(callback.si(run_date))
+    logger.info(f"{task_name} за {run_date}: запущено подзадач {len(chunks)}")
+    return len(chunks)
+
+
+def _reclaim_stale_chunk(task_name, run_date, start):
+    """Забирает зависшую отметку о диапазоне; None, если диапазон обработан или еще обрабатывается"""
+    timeout = getattr(settings, 'MAINTENANCE_CLAIM_TIMEOUT', 3600)
+    stale = MaintenanceRun.objects.filter(
+        task_name=task_name, run_date=run_date, chunk_start=start, status='started',
+        started_at__lt=timezone.now() - timedelta(seconds=timeout),
+    )
+    run = stale.first()
+    # Условное обновление: из параллельных запусков отметку забирает только один
+    if run is None or not stale.filter(pk=run.pk).update(started_at=timezone.now()):
+        return None
+    logger.warning(f"{task_name} за {run_date} [{start}-{run.chunk_end}]: зависший запуск перезапущен")
+    run.refresh_from_db()
+    return run
+
+
+@contextmanager
+def _claim_chunk(task_name, run_date, start, end):
+    """
+    Закрепляет диапазон id за текущим запуском задачи.
+
+    Повторный или параллельный запуск за ту же дату получает None и ничего не делает.
+    Если обработка упала, отметка снимается, чтобы повтор задачи мог выполнить ее заново.
+    Отметку воркера, завершившегося аварийно (статус 'started' дольше
+    MAINTENANCE_CLAIM_TIMEOUT секунд), забирает следующий запуск.
+    """
+    try:
+        with transaction.atomic():
+            run = MaintenanceRun.objects.create(
+                task_name=task_name, run_date=run_date, chunk_start=start, chunk_end=end
+            )
+    except IntegrityError:
+        run = _reclaim_stale_chunk(task_name, run_date, start)
+
+    if run is None:
+        logger.info(f"{task_name} за {run_date} [{start}-{end}] уже обработан, пропускаем")
+        yield None
+        return
+
+    try:
+        yield run
+    except Exception:
+        run.delete()
+        raise
+
+    run.status = 'done'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'result', 'finished_at'])
+
+
+@shared_task
+def send_notifications_task(run_date=None):
+    return _fan_out('send_notifications', send_notifications_chunk_task, run_date,
+                    callback=send_admin_digest_task)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def send_notifications_chunk_task(run_date, start, end):
+    with _claim_chunk('send_notifications', run_date, start, end) as run:
+        if run is None:
+            return 0
+        admin_email = getattr(settings, 'ADMIN_EMAIL', "info@export-center.ru")
+        run.result = enqueue_notifications(
+            admin_email, date.fromisoformat(run_date), Certificate.objects.filter(pk__range=(start, end))
+        )
+    # Отправка идет отдельно от сканирования, поэтому медленный SMTP не задерживает подзадачу
+    deliver_notifications_task.delay()
+    return run.result
+
+
+@shared_task
+def send_admin_digest_task(run_date):
+    # События, не попавшие в сводку из-за сбоя подзадачи, войдут в сводку следующего запуска
+    admin_email = getattr(settings, 'ADMIN_EMAIL', "info@export-center.ru")
+    events = build_admin_digest(admin_email, date.fromisoformat(run_date))
+    deliver_notifications_task.delay()
+    return events
+
+
+@shared_task
+def deliver_notifications_task():
+    return deliver_outbox(max_batches=getattr(settings, 'NOTIFICATION_OUTBOX_MAX_BATCHES', 20))
+
+
+@shared_task
+def sweep_deleted_files_task():
+    return sweep_deleted_files(max_batches=getattr(settings, 'MEDIA_GC_MAX_BATCHES', 50))
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def render_documents_task(certificate_ids):
+    """Генерирует недостающие QR-коды и документы сертификатов (после массового импорта)"""
+    rendered, documents = 0, []
+    for certificate in Certificate.objects.filter(pk__in=certificate_ids).select_related('iso_standard'):
+        changed = render_missing_documents(certificate)
+        if changed:
+            rendered += 1
+            # Поля записаны через UPDATE, сигнал post_save не сработал
+            generate_thumbnails_for([certificate])
+        if {'file1', 'file2'} & set(changed):
+            documents.append(certificate.pk)
+    enqueue_optimization(certificate_ids=documents)
+    return rendered
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def render_audit_documents_task(auditor_ids):
+    """Генерирует недостающие файлы аудита"""
+    rendered, documents = 0, []
+    for auditor in Auditor.objects.filter(pk__in=auditor_ids).select_related('certificate__iso_standard'):
+        changed = render_missing_audit_documents(auditor)
+        if changed:
+            rendered += 1
+            generate_thumbnails_for([auditor])
+        if 'audit_file' in changed:
+            documents.append(auditor.pk)
+    enqueue_optimization(auditor_ids=documents)
+    return rendered
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def optimize_documents_task(certificate_ids=(), auditor_ids=()):
+    """Сжимает PNG сгенерированных документов; возвращает сэкономленные байты"""
+    instances = (list(Certificate.objects.filter(pk__in=certificate_ids)) +
+                 list(Auditor.objects.filter(pk__in=auditor_ids)))
+    report = optimize_documents(instances)
+    # Документы получили новые имена файлов: превью создаются под них
+    generate_thumbnails_for(instances)
+    saved = sum(before - after for _, before, after in report)
+    logger.info(f"Сжатие документов: файлов {len(report)}, сэкономлено {saved} байт")
+    return saved
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def generate_thumbnails_task(names):
+    """Создает отсутствующие превью изображений"""
+    created = []
+    for name in names:
+        created += generate_thumbnails(name)
+    return len(created)
+
 
 @shared_task
-def send_notifications_task():
-    return send_notification()
\ No newline at end of file
+def refresh_statuses_task(run_date=None):
+    return _fan_out('refresh_statuses', refresh_statuses_chunk_task, run_date)
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def refresh_statuses_chunk_task(run_date, start, end):
+    with _claim_chunk('refresh_statuses', run_date, start, end) as run:
+        if run is None:
+            return 0
+        counts = refresh_statuses(
+            today=date.fromisoformat(run_date), queryset=Certificate.objects.filter(pk__range=(start, end))
+        )
+        run.result = sum(counts.values())
+        return run.result
+
+
+@shared_task
+def cleanup_media_task():
+    """
+    Удаляет пустые папки медиа и сообщает о ссылках на отсутствующие файлы.
+
+    Ссылки не очищаются: временная ошибка хранилища или неподключенный диск
+    выглядят как пропажа всех файлов. Очистка выполняется вручную после
+    проверки: manage.py reconcile_media --clear-dangling.
+    """
+    remove_empty_folders()
+    # Ссылки читаются до обхода хранилища: файл, загруженный между шагами, не окажется пропавшим.
+    # Один обход списком вместо запроса exists() на каждый файл
+    referenced = all_referenced_names()
+    dangling = sorted(referenced - scan_media_files().keys())
+    if dangling:
+        logger.warning(
+            f"Ссылок на отсутствующие файлы: {len(dangling)} (например, {', '.join(dangling[:5])}). "
+            f"Проверьте хранилище и выполните reconcile_media --clear-dangling"
+        )
+    return len(dangling)
@@ -2,18 +2,20 @@
 from django import template
 from django.urls import reverse
 from django.conf import settings
-import qrcode
 import base64
 from io import BytesIO
 import logging
 import os
-from PIL import Image
 
 logger = logging.getLogger(__name__)
 register = template.Library()
 
 def create_qr_with_logo_base64(data, logo_path=None, transparent_bg=True):
     """Создает QR-код с логотипом и возвращает в формате base64"""
+    # qrcode и Pillow импортируются при первом вызове, а не при загрузке библиотеки тегов
+    import qrcode
+    from PIL import Image
+
     try:
         # Создание QR-кода
         qr = qrcode.QRCode(
@@ -78,6 +80,8 @@ def create_qr_with_logo_base64(data, logo_path=None, transparent_bg=True):
 @register.simple_tag
 def qr_code_url(certificate_id):
     """Генерирует QR-код с URL сертификата в формате base64"""
+    import qrcode
+
     try:
         url = settings.SITE_URL + reverse('certificate_detail', args=[certificate_id])
         logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
@@ -111,6 +115,8 @@ def qr_code_url(certificate_id):
 @register.simple_tag
 def audit_qr_code_url(certificate_id, auditor_id):
     """Генерирует QR-код с URL аудита в формате base64"""
+    import qrcode
+
     try:
         url = settings.SITE_URL + reverse('audit_detail', args=[certificate_id, auditor_id])
         logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
@@ -144,6 +150,8 @@ def audit_qr_code_url(certificate_id, auditor_id):
 @register.simple_tag
 def permission_qr_code_url(certificate_id):
     """Генерирует QR-код с URL разрешения в формате base64"""
+    import qrcode
+
     try:
         url = settings.SITE_URL + reverse('permission_detail', args=[certificate_id])
         logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
@@ -177,6 +185,8 @@ def permission_qr_code_url(certificate_id):
 @register.simple_tag
 def custom_qr_code(data, size=10, border=5):
     """Генерирует QR-код для произвольных данных"""
+    import qrcode
+
     try:
         qr = qrcode.QRCode(
             version=1, 
@@ -0,0 +1,28 @@
+from django import template
+from ..thumbnails import THUMBNAIL_SIZES, is_image as _is_image, thumbnail_url as _thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def is_image(file):
+    """Файл - изображение, для которого есть превью"""
+    return bool(file) and _is_image(file.name)
+
+
+@register.simple_tag
+def thumbnail_url(file, size='small', fmt='png'):
+    """URL превью; для файлов, не являющихся изображениями, - URL самого файла"""
+    if not file:
+        return ''
+    if not _is_image(file.name):
+        return file.url
+    return _thumbnail_url(file, size, fmt)
+
+
+@register.simple_tag
+def thumbnail_srcset(file, fmt='png'):
+    """Значение srcset со всеми размерами превью; ширина - сторона квадрата, в который вписано превью"""
+    if not file or not _is_image(file.name):
+        return ''
+    return ', '.join(f'{_thumbnail_url(file, size, fmt)} {width}w' for size, width in THUMBNAIL_SIZES.items())
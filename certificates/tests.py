@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Certificate, Auditor, ISOStandard
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class AdminChangelistQueryCountTests(TestCase):
+    """Число запросов списков сертификатов и аудиторов в админке не зависит от числа строк"""
+
+    ROWS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.standards = [
+            ISOStandard.objects.create(standard_name=f'ISO {index}', certificate_number_prefix=f'.{index}',
+                                       certificate_standard_name=f'ISO {index}')
+            for index in range(2)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.created = 0
+
+    def _add_certificates(self, count):
+        # bulk_create: сохранение через save() генерирует QR-код и документы
+        today = date.today()
+        certificates = Certificate.objects.bulk_create([
+            Certificate(
+                name=f'Организация {number}', inn=f'{number:010d}', address='Адрес',
+                certificate_number_part=f'{number:05d}', full_certificate_number=f'№SMK.{number:05d}',
+                iso_standard=self.standards[number % 2], quality_management_system='СМК',
+                start_date=today, expiry_date=today + timedelta(days=3 * 365),
+            )
+            for number in range(self.created + 1, self.created + count + 1)
+        ])
+        self.created += count
+        Auditor.objects.bulk_create([
+            Auditor(certificate=certificate, full_name=f'Аудитор {certificate.certificate_number_part}')
+            for certificate in Certificate.objects.filter(pk__in=[c.pk for c in certificates])
+        ])
+
+    def _assert_constant_queries(self, url):
+        self._add_certificates(1)
+        with CaptureQueriesContext(connection) as single:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self._add_certificates(self.ROWS - 1)
+        with self.assertNumQueries(len(single)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, self.ROWS)
+
+    def test_certificate_changelist(self):
+        self._assert_constant_queries(reverse('admin:certificates_certificate_changelist'))
+
+    def test_certificate_changelist_search(self):
+        self._assert_constant_queries(reverse('admin:certificates_certificate_changelist') + '?q=0')
+
+    def test_auditor_changelist(self):
+        self._assert_constant_queries(reverse('admin:certificates_auditor_changelist'))
+
+    def test_auditor_changelist_search(self):
+        self._assert_constant_queries(reverse('admin:certificates_auditor_changelist') + '?q=Аудитор')
@@ -0,0 +1,136 @@
+"""
+Уменьшенные копии изображений для превью.
+
+Для каждого изображения из файловых полей создаются превью нескольких размеров
+в WebP и PNG (для браузеров без WebP). Имя превью выводится из имени исходного
+файла, поэтому ссылку можно построить без обращения к хранилищу:
+
+    certificates/certificate_5.png -> thumbnails/small/certificates/certificate_5.png.webp
+
+Превью создаются фоновой задачей после сохранения файла, а отсутствующие -
+при первом запросе через protected_media. Удаляются вместе с исходным файлом
+(см. certificates.media).
+"""
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from io import BytesIO
+import logging
+import posixpath
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+
+# Размер -> сторона квадрата, в который вписывается изображение
+THUMBNAIL_SIZES = {
+    'small': 240,
+    'medium': 1200,
+}
+THUMBNAIL_FORMATS = ['webp', 'png']
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+def is_image(name):
+    return bool(name) and name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def thumbnail_name(name, size, fmt):
+    return f'{THUMBNAIL_DIR}/{size}/{name}.{fmt}'
+
+
+def thumbnail_names(name):
+    """Все превью исходного файла; для файлов, не являющихся изображениями, - пустой список"""
+    if not is_image(name):
+        return []
+    return [thumbnail_name(name, size, fmt) for size in THUMBNAIL_SIZES for fmt in THUMBNAIL_FORMATS]
+
+
+def source_name(name):
+    """Имя исходного файла для пути превью или None, если это не превью"""
+    parts = name.split('/', 2)
+    if len(parts) < 3 or parts[0] != THUMBNAIL_DIR or parts[1] not in THUMBNAIL_SIZES:
+        return None
+    source, fmt = posixpath.splitext(parts[2])
+    if fmt[1:] not in THUMBNAIL_FORMATS or not is_image(source):
+        return None
+    return source
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, format='WEBP', quality=getattr(settings, 'THUMBNAIL_WEBP_QUALITY', 80), method=4)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def generate_thumbnails(name, storage=None, force=False):
+    """
+    Создает отсутствующие превью изображения name.
+
+    Исходный файл читается и декодируется один раз на все размеры и форматы.
+    Возвращает список созданных имен.
+    """
+    from PIL import Image
+
+    storage = storage or default_storage
+    if not is_image(name):
+        return []
+    missing = [(size, fmt) for size in THUMBNAIL_SIZES for fmt in THUMBNAIL_FORMATS
+               if force or not storage.exists(thumbnail_name(name, size, fmt))]
+    if not missing:
+        return []
+
+    try:
+        source = storage.open(name, 'rb')
+    except FileNotFoundError:
+        # Исходный файл уже удален: превью не нужны
+        logger.info(f"Нет исходного файла для превью: {name}")
+        return []
+    with source:
+        image = Image.open(source)
+        # draft ускоряет декодирование JPEG сразу в уменьшенном масштабе
+        image.draft('RGB', (max(THUMBNAIL_SIZES.values()),) * 2)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    created = []
+    # От большего размера к меньшему: каждое следующее уменьшение идет из предыдущего
+    for size in sorted(THUMBNAIL_SIZES, key=THUMBNAIL_SIZES.get, reverse=True):
+        image = image.copy()
+        image.thumbnail((THUMBNAIL_SIZES[size],) * 2, Image.Resampling.LANCZOS)
+        for fmt in THUMBNAIL_FORMATS:
+            if (size, fmt) not in missing:
+                continue
+            target = thumbnail_name(name, size, fmt)
+            if force and storage.exists(target):
+                storage.delete(target)
+            created.append(storage.save(target, ContentFile(_encode(image, fmt))))
+    return created
+
+
+def generate_thumbnails_for(instances):
+    """Создает превью для всех изображений в файловых полях объектов"""
+    created = []
+    for instance in instances:
+        for field in instance._meta.fields:
+            if not isinstance(field, models.FileField):
+                continue
+            name = getattr(instance, field.name).name
+            if not is_image(name):
+                continue
+            try:
+                created += generate_thumbnails(name)
+            except Exception as e:
+                logger.warning(f"Не удалось создать превью {name}: {e}")
+    return created
+
+
+def thumbnail_url(file, size, fmt='png'):
+    """URL превью файла; превью, которого еще нет, создаст protected_media при первом запросе"""
+    return default_storage.url(thumbnail_name(file.name, size, fmt))
@@ -8,6 +8,11 @@ urlpatterns = [
     path('download/<int:certificate_id>/<int:file_num>/', views.download_file, name='download_file'),
     path('permission/<int:certificate_id>/', views.permission_detail, name='permission_detail'),
     path('audit/<int:certificate_id>/<int:auditor_id>/', views.audit_detail, name='audit_detail'),
+
+    # Изображения заполненных документов для публичных страниц
+    path('certificate/<int:certificate_id>/image/', views.certificate_image, name='certificate_image'),
+    path('permission/<int:certificate_id>/image/', views.permission_image, name='permission_image'),
+    path('audit/<int:certificate_id>/<int:auditor_id>/image/', views.audit_image, name='audit_image'),
     
     # Генерация изображений и предпросмотров
     path('generate-audit-preview/<int:certificate_id>/<int:auditor_id>/', views.generate_audit_preview, name='generate_audit_preview'),
@@ -1,324 +1,88 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from django.template.loader import render_to_string
 from django.utils import timezone
 from datetime import timedelta
-from .models import Certificate
+from django.db import transaction
+from django.db.models import F, Q
+from .models import Certificate, Auditor, NotificationOutbox
 import logging
 import traceback
+import threading
+import time
 from django.conf import settings
-from django.core.files.base import ContentFile
-from PIL import Image, ImageDraw, ImageFont
-import qrcode
-from io import BytesIO
-import os
-from django.urls import reverse
-from psd_tools import PSDImage
-# Добавить в начало файла после импортов
-
-def create_qr_with_logo(data, logo_path=None, transparent_bg=True):
-    """Создает QR-код с логотипом и прозрачным фоном"""
-    try:
-        # Создание QR-кода
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,  # Высокий уровень коррекции для логотипа
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        
-        # Создание изображения QR-кода
-        if transparent_bg:
-            qr_img = qr.make_image(fill_color="black", back_color=None)
-            qr_img = qr_img.convert("RGBA")
-            # Делаем белый фон прозрачным
-            datas = qr_img.getdata()
-            newData = []
-            for item in datas:
-                if item[0] == 255 and item[1] == 255 and item[2] == 255:  # белый цвет
-                    newData.append((255, 255, 255, 0))  # прозрачный
-                else:
-                    newData.append(item)
-            qr_img.putdata(newData)
-        else:
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            qr_img = qr_img.convert("RGBA")
-        
-        # Добавление логотипа если указан путь
-        if logo_path and os.path.exists(logo_path):
-            try:
-                logo = Image.open(logo_path)
-                logo = logo.convert("RGBA")
-                
-                # Размер логотипа (не более 30% от размера QR-кода)
-                qr_width, qr_height = qr_img.size
-                logo_size = min(qr_width, qr_height) // 4
-                logo = logo.resize((logo_size, logo_size), Image.Resampling.LANCZOS)
-                
-                # Создание белого фона для логотипа
-                logo_bg = Image.new('RGBA', (logo_size + 20, logo_size + 20), (255, 255, 255, 255))
-                logo_bg.paste(logo, (10, 10), logo)
-                
-                # Позиционирование в центре
-                logo_pos = ((qr_width - logo_bg.size[0]) // 2, (qr_height - logo_bg.size[1]) // 2)
-                qr_img.paste(logo_bg, logo_pos, logo_bg)
-                
-            except Exception as e:
-                logger.error(f"Не удалось добавить логотип: {str(e)}")
 
-        return qr_img
-        
-    except Exception as e:
-        logger.error(f"Ошибка при создании QR-кода с логотипом: {str(e)}")
-        return None
 logger = logging.getLogger(__name__)
 
-def generate_certificate_image(certificate, file1_cleared=False, file1_psd_cleared=False):
-    """Генерирует изображения сертификата (PNG и PSD)"""
-    if file1_cleared and file1_psd_cleared:
-        return None
-
-    result = {}
-    
-    try:
-        if not file1_cleared or not file1_psd_cleared:
-            psd_path = os.path.join(settings.BASE_DIR, 'static', 'certificates', 'img', 'certificate_background.psd')
-            
-            if not os.path.exists(psd_path):
-                logger.error(f"PSD template not found: {psd_path}")
-                return None
-                
-            psd = PSDImage.open(psd_path)
-            
-            # Генерация QR-кода с логотипом
-            url = settings.SITE_URL + reverse('certificate_detail', args=[certificate.id])
-            logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
-            qr_img = create_qr_with_logo(url, logo_path, transparent_bg=True)
-            
-            if not qr_img:
-                # Fallback к обычному QR-коду
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data(url)
-                qr.make(fit=True)
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            replace_dict = {
-                '%%CERTIFICATE_NUMBER%%': certificate.full_certificate_number,
-                '%%ORGANIZATION_NAME%%': certificate.name,
-                '%%INN%%': certificate.inn,
-                '%%ADDRESS%%': certificate.address,
-                '%%QUALITY_MANAGEMENT_SYSTEM%%': certificate.quality_management_system,
-                '%%ISO_STANDARD%%': certificate.iso_standard_name or str(certificate.iso_standard),
-                '%%START_DATE%%': certificate.start_date.strftime('%d.%m.%Y'),
-                '%%EXPIRY_DATE%%': certificate.expiry_date.strftime('%d.%m.%Y'),
-            }
-            
-            # Обработка текстовых слоев
-            for layer in psd:
-                if layer.kind == 'type':
-                    try:
-                        if hasattr(layer, 'text') and layer.text is not None:
-                            original_text = layer.text.value
-                            new_text = original_text
-                            for key, value in replace_dict.items():
-                                if key in original_text:
-                                    new_text = new_text.replace(key, str(value))
-                            
-                            if new_text != original_text:
-                                layer.text.value = new_text
-                                logger.info(f"Successfully updated text in layer: {layer.name}")
-                    except Exception as e:
-                        logger.error(f"Error updating text in layer {layer.name}: {str(e)}")
-                
-                elif layer.name == '%%QR%%':
-                    try:
-                        # Логика для замены QR-кода требует дополнительной реализации
-                        logger.info("QR code layer found")
-                    except Exception as e:
-                        logger.error(f"Error adding QR code: {str(e)}")
-
-            # Сохранение PSD
-            if not file1_psd_cleared:
-                psd_buffer = BytesIO()
-                psd.save(psd_buffer)
-                psd_buffer.seek(0)
-                result['psd'] = ContentFile(psd_buffer.getvalue(), name=f'certificate_{certificate.id}.psd')
-
-            # Сохранение PNG
-            if not file1_cleared:
-                png_image = psd.composite()
-                png_buffer = BytesIO()
-                png_image.save(png_buffer, format='PNG')
-                png_buffer.seek(0)
-                result['png'] = ContentFile(png_buffer.getvalue(), name=f'certificate_{certificate.id}.png')
-
-    except Exception as e:
-        logger.error(f"Error generating certificate image: {str(e)}")
-        return None
-
-    return result
 
-def generate_permission_image(certificate, file2_cleared=False, file2_psd_cleared=False):
-    """Генерирует изображения разрешения (PNG и PSD)"""
-    if file2_cleared and file2_psd_cleared:
-        return None
+def _rendering(name):
+    """Обертка над функцией из certificates.rendering, импортирующая модуль при первом вызове"""
+    def call(*args, **kwargs):
+        from . import rendering
+        return getattr(rendering, name)(*args, **kwargs)
+    call.__name__ = call.__qualname__ = name
+    return call
 
-    result = {}
-    
-    try:
-        if not file2_cleared or not file2_psd_cleared:
-            psd_path = os.path.join(settings.BASE_DIR, 'static', 'certificates', 'img', 'permission_background.psd')
-            
-            if not os.path.exists(psd_path):
-                logger.error(f"PSD template not found: {psd_path}")
-                return None
-                
-            psd = PSDImage.open(psd_path)
-            
-            # Генерация QR-кода с логотипом
-            url = settings.SITE_URL + reverse('permission_detail', args=[certificate.id])
-            logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
-            qr_img = create_qr_with_logo(url, logo_path, transparent_bg=True)
-            
-            if not qr_img:
-                # Fallback к обычному QR-коду
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data(url)
-                qr.make(fit=True)
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            replace_dict = {
-                '%%CERTIFICATE_NUMBER%%': certificate.full_certificate_number,
-                '%%ORGANIZATION_NAME%%': certificate.name,
-                '%%INN%%': certificate.inn,
-                '%%ADDRESS%%': certificate.address,
-            }
-            
-            # Обработка текстовых слоев
-            for layer in psd:
-                if layer.kind == 'type':
-                    try:
-                        if hasattr(layer, 'text') and layer.text is not None:
-                            original_text = layer.text.value
-                            new_text = original_text
-                            for key, value in replace_dict.items():
-                                if key in original_text:
-                                    new_text = new_text.replace(key, str(value))
-                            
-                            if new_text != original_text:
-                                layer.text.value = new_text
-                                logger.info(f"Successfully updated text in layer: {layer.name}")
-                    except Exception as e:
-                        logger.error(f"Error updating text in layer {layer.name}: {str(e)}")
-                
-                elif layer.name == '%%QR%%':
-                    try:
-                        logger.info("QR code layer found for permission")
-                    except Exception as e:
-                        logger.error(f"Error adding QR code: {str(e)}")
-
-            # Сохранение PSD
-            if not file2_psd_cleared:
-                psd_buffer = BytesIO()
-                psd.save(psd_buffer)
-                psd_buffer.seek(0)
-                result['psd'] = ContentFile(psd_buffer.getvalue(), name=f'permission_{certificate.id}.psd')
-
-            # Сохранение PNG
-            if not file2_cleared:
-                png_image = psd.composite()
-                png_buffer = BytesIO()
-                png_image.save(png_buffer, format='PNG')
-                png_buffer.seek(0)
-                result['png'] = ContentFile(png_buffer.getvalue(), name=f'permission_{certificate.id}.png')
-
-    except Exception as e:
-        logger.error(f"Error generating permission image: {str(e)}")
-        return None
 
-    return result
+create_qr_with_logo = _rendering('create_qr_with_logo')
+generate_certificate_image = _rendering('generate_certificate_image')
+generate_permission_image = _rendering('generate_permission_image')
+generate_audit_image = _rendering('generate_audit_image')
 
-def generate_audit_image(certificate, auditor, audit_number, audit_file_cleared=False, audit_file_psd_cleared=False):
-    """Генерирует изображения аудита (PNG и PSD)"""
-    if audit_file_cleared and audit_file_psd_cleared:
-        return None
 
-    result = {}
-    
-    try:
-        if not audit_file_cleared or not audit_file_psd_cleared:
-            psd_path = os.path.join(settings.BASE_DIR, 'static', 'certificates', 'img', 'audit_background.psd')
-            
-            if not os.path.exists(psd_path):
-                logger.error(f"PSD template not found: {psd_path}")
-                return None
-                
-            psd = PSDImage.open(psd_path)
-            
-            # Генерация QR-кода с логотипом
-            url = settings.SITE_URL + reverse('audit_detail', args=[certificate.id, auditor.id])
-            logo_path = os.path.join(settings.BASE_DIR, 'certificates', 'static', 'certificates', 'img', 'company_logo.png')
-            qr_img = create_qr_with_logo(url, logo_path, transparent_bg=True)
-            
-            if not qr_img:
-                # Fallback к обычному QR-коду
-                qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                qr.add_data(url)
-                qr.make(fit=True)
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            replace_dict = {
-                '%%AUDIT_NUMBER%%': audit_number,
-                '%%AUDIT_NAME%%': auditor.full_name,
-                '%%ISO_STANDARD%%': str(certificate.iso_standard),
-                '%%START_DATE%%': certificate.start_date.strftime('%d.%m.%Y'),
-                '%%EXPIRY_DATE%%': certificate.expiry_date.strftime('%d.%m.%Y'),
-            }
-            
-            # Обработка текстовых слоев
-            for layer in psd:
-                if layer.kind == 'type':
-                    try:
-                        if hasattr(layer, 'text') and layer.text is not None:
-                            original_text = layer.text.value
-                            new_text = original_text
-                            for key, value in replace_dict.items():
-                                if key in original_text:
-                                    new_text = new_text.replace(key, str(value))
-                            
-                            if new_text != original_text:
-                                layer.text.value = new_text
-                                logger.info(f"Successfully updated text in layer: {layer.name}")
-                    except Exception as e:
-                        logger.error(f"Error updating text in layer {layer.name}: {str(e)}")
-                
-                elif layer.name == '%%QR%%':
-                    try:
-                        logger.info("QR code layer found for audit")
-                    except Exception as e:
-                        logger.error(f"Error adding QR code: {str(e)}")
-
-            # Сохранение PSD
-            if not audit_file_psd_cleared:
-                psd_buffer = BytesIO()
-                psd.save(psd_buffer)
-                psd_buffer.seek(0)
-                result['psd'] = ContentFile(psd_buffer.getvalue(), name=f'audit_{certificate.id}_{auditor.id}.psd')
-
-            # Сохранение PNG
-            if not audit_file_cleared:
-                png_image = psd.composite()
-                png_buffer = BytesIO()
-                png_image.save(png_buffer, format='PNG')
-                png_buffer.seek(0)
-                result['png'] = ContentFile(png_buffer.getvalue(), name=f'audit_{certificate.id}_{auditor.id}.png')
+def render_missing_documents(certificate):
+    """
+    Генерирует отсутствующие у сертификата QR-код и документы (сертификат и разрешение, PNG и PSD).
 
-    except Exception as e:
-        logger.error(f"Error generating audit image: {str(e)}")
-        return None
+    Имена файлов совпадают с генерацией в админке. Поля записываются одним UPDATE,
+    без повторного вызова save(). Возвращает список обновленных полей.
+    """
+    changed = []
+    if not certificate.qr_code and certificate._generate_qr_code():
+        changed.append('qr_code')
 
-    return result
+    documents = (
+        (generate_certificate_image, 'certificates/certificate', 'file1', 'file1_psd'),
+        (generate_permission_image, 'permissions/permission', 'file2', 'file2_psd'),
+    )
+    for generate, prefix, png_field, psd_field in documents:
+        if getattr(certificate, png_field) and getattr(certificate, psd_field):
+            continue
+        images = generate(certificate) or {}
+        for field, extension in ((png_field, 'png'), (psd_field, 'psd')):
+            if not getattr(certificate, field) and images.get(extension):
+                getattr(certificate, field).save(f'{prefix}_{certificate.id}.{extension}', images[extension], save=False)
+                changed.append(field)
+
+    if changed:
+        Certificate.objects.filter(pk=certificate.pk).update(
+            **{field: getattr(certificate, field).name for field in changed}
+        )
+    return changed
+
+
+def render_missing_audit_documents(auditor):
+    """
+    Генерирует отсутствующие у аудитора файлы аудита (PNG и PSD).
+
+    Как и render_missing_documents: имена файлов совпадают с генерацией в админке,
+    поля записываются одним UPDATE. Возвращает список обновленных полей.
+    """
+    changed = []
+    if auditor.audit_file and auditor.audit_file_psd:
+        return changed
+    images = generate_audit_image(auditor.certificate, auditor, auditor.audit_number) or {}
+    for field, extension in (('audit_file', 'png'), ('audit_file_psd', 'psd')):
+        if not getattr(auditor, field) and images.get(extension):
+            getattr(auditor, field).save(
+                f'audit_files/audit_{auditor.certificate_id}_{auditor.id}.{extension}', images[extension], save=False
+            )
+            changed.append(field)
+
+    if changed:
+        Auditor.objects.filter(pk=auditor.pk).update(**{field: getattr(auditor, field).name for field in changed})
+    return changed
 
 def send_notification(certificate=None, recipient_type=None, notification_type=None):
     """Отправляет уведомления о сертификатах"""
@@ -330,8 +94,8 @@ def send_notification(certificate=None, recipient_type=None, notification_type=N
     else:
         return send_mass_notifications(admin_email, today)
 
-def send_single_notification(cert, recipient_type, notification_type, admin_email):
-    """Отправляет одиночное уведомление"""
+def build_notification_message(cert, recipient_type, notification_type, admin_email):
+    """Подготавливает письмо уведомления без отправки; возвращает None, если отправлять некому"""
     context = {
         'client_name': cert.name,
         'standard': cert.iso_standard,
@@ -344,25 +108,24 @@ def send_single_notification(cert, recipient_type, notification_type, admin_emai
         'second_inspection_date': cert.second_inspection_date.strftime('%d.%m.%Y') if cert.second_inspection_date else 'Не назначена',
     }
 
-    try:
-        if recipient_type == 'admin':
-            subject = f"Уведомление о сертификате {cert.full_certificate_number}"
-            
-            # Определяем шаблон в зависимости от типа уведомления
-            if notification_type == 'expiry_warning':
-                template_name = 'certificates/emails/admin_expiry_warning.txt'
-            elif notification_type == 'inspection_reminder':
-                template_name = 'certificates/emails/admin_inspection_reminder.txt'
-            elif notification_type == 'status_change':
-                template_name = 'certificates/emails/admin_status_change.txt'
-            else:
-                template_name = 'certificates/emails/admin_notification.txt'
-            
-            try:
-                message = render_to_string(template_name, context)
-            except Exception:
-                # Fallback к простому тексту если шаблон не найден
-                message = f"""
+    if recipient_type == 'admin':
+        subject = f"Уведомление о сертификате {cert.full_certificate_number}"
+        
+        # Определяем шаблон в зависимости от типа уведомления
+        if notification_type == 'expiry_warning':
+            template_name = 'certificates/emails/admin_expiry_warning.txt'
+        elif notification_type == 'inspection_reminder':
+            template_name = 'certificates/emails/admin_inspection_reminder.txt'
+        elif notification_type == 'status_change':
+            template_name = 'certificates/emails/admin_status_change.txt'
+        else:
+            template_name = 'certificates/emails/admin_notification.txt'
+        
+        try:
+            message = render_to_string(template_name, context)
+        except Exception:
+            # Fallback к простому тексту если шаблон не найден
+            message = f"""
 Уведомление о сертификате {cert.full_certificate_number}
 
 Организация: {cert.name}
@@ -373,30 +136,28 @@ def send_single_notification(cert, recipient_type, notification_type, admin_emai
 
 С уважением,
 Система управления сертификатами
-                """
-            
-            send_mail(subject, message, admin_email, [admin_email], fail_silently=False)
-            logger.info(f"Admin notification sent for certificate {cert.full_certificate_number}")
-            return 1
-            
-        elif recipient_type == 'client' and hasattr(cert, 'client_email') and cert.client_email:
-            subject = f"Уведомление о вашем сертификате {cert.full_certificate_number}"
-            
-            # Определяем шаблон для клиента
-            if notification_type == 'expiry_warning':
-                template_name = 'certificates/emails/client_expiry_warning.txt'
-            elif notification_type == 'inspection_reminder':
-                template_name = 'certificates/emails/client_inspection_reminder.txt'
-            elif notification_type == 'status_change':
-                template_name = 'certificates/emails/client_status_change.txt'
-            else:
-                template_name = 'certificates/emails/client_notification.txt'
-            
-            try:
-                message = render_to_string(template_name, context)
-            except Exception:
-                # Fallback к простому тексту если шаблон не найден
-                message = f"""
+            """
+        
+        return EmailMessage(subject, message, admin_email, [admin_email])
+        
+    elif recipient_type == 'client' and hasattr(cert, 'client_email') and cert.client_email:
+        subject = f"Уведомление о вашем сертификате {cert.full_certificate_number}"
+        
+        # Определяем шаблон для клиента
+        if notification_type == 'expiry_warning':
+            template_name = 'certificates/emails/client_expiry_warning.txt'
+        elif notification_type == 'inspection_reminder':
+            template_name = 'certificates/emails/client_inspection_reminder.txt'
+        elif notification_type == 'status_change':
+            template_name = 'certificates/emails/client_status_change.txt'
+        else:
+            template_name = 'certificates/emails/client_notification.txt'
+        
+        try:
+            message = render_to_string(template_name, context)
+        except Exception:
+            # Fallback к простому тексту если шаблон не найден
+            message = f"""
 Уважаемые коллеги!
 
 Уведомляем Вас о статусе сертификата {cert.full_certificate_number}
@@ -410,67 +171,307 @@ def send_single_notification(cert, recipient_type, notification_type, admin_emai
 
 С уважением,
 Система добровольной сертификации "Export Quality System"
-                """
-            
-            send_mail(subject, message, admin_email, [cert.client_email], fail_silently=False)
-            logger.info(f"Client notification sent for certificate {cert.full_certificate_number}")
-            return 1
-        else:
-            logger.warning(f"Invalid recipient type or missing client email for certificate {cert.full_certificate_number}")
+            """
+        
+        return EmailMessage(subject, message, admin_email, [cert.client_email])
+    else:
+        logger.warning(f"Invalid recipient type or missing client email for certificate {cert.full_certificate_number}")
+        return None
+
+def send_single_notification(cert, recipient_type, notification_type, admin_email):
+    """Отправляет одиночное уведомление"""
+    try:
+        email = build_notification_message(cert, recipient_type, notification_type, admin_email)
+        if email is None:
             return 0
+        email.send(fail_silently=False)
+        logger.info(f"{recipient_type.capitalize()} notification sent for certificate {cert.full_certificate_number}")
+        return 1
             
     except Exception as e:
         logger.error(f"Ошибка при отправке уведомления для сертификата {cert.full_certificate_number}: {str(e)}")
         logger.error(traceback.format_exc())
         return 0
 
-def send_mass_notifications(admin_email, today):
-    """Отправляет массовые уведомления"""
-    certificates = Certificate.objects.filter(notifications_enabled=True)
-    logger.info(f"Found {certificates.count()} certificates with notifications enabled")
-    notifications_sent = 0
+class _RateLimiter:
+    """Общий для всех потоков ограничитель частоты отправки писем"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _send_batch(messages, limiter):
+    """Отправляет пачку писем через одно SMTP-соединение; возвращает текст ошибки или None для каждого письма"""
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Не удалось подключиться к SMTP-серверу: {str(e)}")
+        return [str(e)] * len(messages)
+
+    errors = []
+    try:
+        for message in messages:
+            limiter.wait()
+            try:
+                connection.send_messages([message])
+                errors.append(None)
+            except Exception as e:
+                logger.error(f"Ошибка при отправке письма '{message.subject}' на {message.to}: {str(e)}")
+                errors.append(str(e))
+                # После ошибки SMTP-сессия может быть разорвана, поэтому переподключаемся
+                connection.close()
+                try:
+                    connection.open()
+                except Exception as e:
+                    logger.error(f"Не удалось переподключиться к SMTP-серверу: {str(e)}")
+                    errors.extend([str(e)] * (len(messages) - len(errors)))
+                    break
+    finally:
+        connection.close()
+    return errors
+
+def _deliver(messages):
+    """Отправляет письма пачками; возвращает текст ошибки или None для каждого письма"""
+    if not messages:
+        return []
+
+    batch_size = max(1, getattr(settings, 'NOTIFICATION_BATCH_SIZE', 50))
+    workers = max(1, getattr(settings, 'NOTIFICATION_SMTP_WORKERS', 1))
+    limiter = _RateLimiter(getattr(settings, 'NOTIFICATION_RATE_LIMIT', 0))
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+
+    if workers == 1 or len(batches) == 1:
+        batch_errors = [_send_batch(batch, limiter) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            batch_errors = list(pool.map(lambda batch: _send_batch(batch, limiter), batches))
+
+    return [error for errors in batch_errors for error in errors]
+
+def deliver_messages(messages):
+    """
+    Отправляет подготовленные письма через переиспользуемые SMTP-соединения.
+
+    Письма делятся на пачки по NOTIFICATION_BATCH_SIZE, каждая пачка идет по своему
+    соединению; до NOTIFICATION_SMTP_WORKERS пачек отправляются параллельно.
+    NOTIFICATION_RATE_LIMIT ограничивает общую частоту отправки (писем в секунду).
+    Возвращает список флагов успешной отправки в порядке писем.
+    """
+    return [error is None for error in _deliver(messages)]
+
+def deliver_outbox(batch_size=None, max_batches=None):
+    """
+    Отправляет накопившиеся в очереди уведомления.
+
+    Строки забираются пачками: у взятых строк сдвигается next_attempt_at на время
+    аренды, поэтому параллельные обработчики их не трогают, а после падения
+    обработчика строки снова станут доступны. Неудачные отправки повторяются
+    с экспоненциальной задержкой, после NOTIFICATION_MAX_ATTEMPTS строка
+    помечается как недоставленная.
+    """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 100)
+    max_attempts = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+    retry_base = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 60)
+    lease = timedelta(seconds=getattr(settings, 'NOTIFICATION_SEND_LEASE_SECONDS', 600))
+    sent_total = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True)
+                .filter(status='pending', next_attempt_at__lte=now)
+                .order_by('next_attempt_at')[:batch_size]
+            )
+            if not rows:
+                break
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                next_attempt_at=now + lease, attempts=F('attempts') + 1
+            )
+        batches += 1
+
+        errors = _deliver([
+            EmailMessage(row.subject, row.body, row.from_email, [row.recipient]) for row in rows
+        ])
+
+        now = timezone.now()
+        for row, error in zip(rows, errors):
+            row.attempts += 1
+            if error is None:
+                row.status = 'sent'
+                row.sent_at = now
+                row.last_error = ''
+                sent_total += 1
+            elif row.attempts >= max_attempts:
+                row.status = 'dead'
+                row.last_error = error
+                logger.error(f"Уведомление {row.pk} для {row.recipient} не доставлено после {row.attempts} попыток")
+            else:
+                row.next_attempt_at = now + timedelta(seconds=retry_base * 2 ** (row.attempts - 1))
+                row.last_error = error
+        NotificationOutbox.objects.bulk_update(
+            rows, ['status', 'attempts', 'sent_at', 'next_attempt_at', 'last_error']
+        )
+
+    logger.info(f"Notifications delivered from outbox: {sent_total}")
+    return sent_total
+
+EXPIRY_NOTIFICATION_DAYS = (30, 15, 7, 1)
+INSPECTION_NOTIFICATION_DAYS = (30, 15, 7)
+
+NOTIFICATION_TYPE_LABELS = {
+    'expiry_warning': 'Истекает срок действия',
+    'inspection_reminder': 'Предстоит инспекционный контроль',
+    'status_change': 'Изменен статус',
+}
+
+def get_notification_candidates(today, queryset=None):
+    """Сертификаты, по которым сегодня действительно положено уведомление"""
+    queryset = Certificate.objects.all() if queryset is None else queryset
+    expiry_dates = [today + timedelta(days=days) for days in EXPIRY_NOTIFICATION_DAYS]
+    inspection_dates = [today + timedelta(days=days) for days in INSPECTION_NOTIFICATION_DAYS]
+    return queryset.filter(
+        Q(expiry_date__in=expiry_dates) |
+        Q(first_inspection_date__in=inspection_dates) |
+        Q(second_inspection_date__in=inspection_dates) |
+        Q(expiry_date__lt=today, status='active'),
+        notifications_enabled=True,
+    ).select_related('iso_standard')
+
+def enqueue_notifications(admin_email, today, queryset=None):
+    """Ставит в очередь уведомления, положенные на сегодня (по всему реестру или по переданной выборке)"""
+    certificates = get_notification_candidates(today, queryset)
+    digest = getattr(settings, 'NOTIFICATION_ADMIN_DIGEST', False)
+    rows = {}
+
+    def enqueue(cert, recipient_type, notification_type):
+        email = build_notification_message(cert, recipient_type, notification_type, admin_email)
+        if email is None:
+            return
+        recipient = email.to[0]
+        dedup_key = f"{today.isoformat()}:{cert.pk}:{notification_type}:{recipient}"
+        rows[dedup_key] = NotificationOutbox(
+            certificate=cert, recipient_type=recipient_type, notification_type=notification_type,
+            from_email=email.from_email, recipient=recipient, subject=email.subject, body=email.body,
+            dedup_key=dedup_key,
+            # В режиме сводки письма администратору не отправляются по отдельности
+            status='digest' if digest and recipient_type == 'admin' else 'pending',
+        )
 
     for cert in certificates:
         try:
-            expiry_date = cert.expiry_date
-            days_until_expiry = (expiry_date - today).days
-            logger.info(f"Processing certificate {cert.full_certificate_number}, days until expiry: {days_until_expiry}")
+            days_until_expiry = (cert.expiry_date - today).days
             
             # Уведомления о скором истечении срока действия
-            if days_until_expiry in [30, 15, 7, 1]:
+            if days_until_expiry in EXPIRY_NOTIFICATION_DAYS:
                 notification_type = 'expiry_warning'
-                notifications_sent += send_single_notification(cert, 'admin', notification_type, admin_email)
-                if hasattr(cert, 'client_email') and cert.client_email:
-                    notifications_sent += send_single_notification(cert, 'client', notification_type, admin_email)
+                enqueue(cert, 'admin', notification_type)
+                if cert.client_email:
+                    enqueue(cert, 'client', notification_type)
             
             # Уведомления о предстоящих инспекционных контролях
-            if cert.first_inspection_date:
-                days_until_first_inspection = (cert.first_inspection_date - today).days
-                if days_until_first_inspection in [30, 15, 7]:
-                    notification_type = 'inspection_reminder'
-                    notifications_sent += send_single_notification(cert, 'admin', notification_type, admin_email)
-                    if hasattr(cert, 'client_email') and cert.client_email:
-                        notifications_sent += send_single_notification(cert, 'client', notification_type, admin_email)
-            
-            if cert.second_inspection_date:
-                days_until_second_inspection = (cert.second_inspection_date - today).days
-                if days_until_second_inspection in [30, 15, 7]:
+            for inspection_date in (cert.first_inspection_date, cert.second_inspection_date):
+                if inspection_date and (inspection_date - today).days in INSPECTION_NOTIFICATION_DAYS:
                     notification_type = 'inspection_reminder'
-                    notifications_sent += send_single_notification(cert, 'admin', notification_type, admin_email)
-                    if hasattr(cert, 'client_email') and cert.client_email:
-                        notifications_sent += send_single_notification(cert, 'client', notification_type, admin_email)
+                    enqueue(cert, 'admin', notification_type)
+                    if cert.client_email:
+                        enqueue(cert, 'client', notification_type)
             
             # Автоматическое изменение статуса просроченных сертификатов
             if days_until_expiry < 0 and cert.status == 'active':
                 cert.status = 'expired'
                 cert.save()
-                notification_type = 'status_change'
-                notifications_sent += send_single_notification(cert, 'admin', notification_type, admin_email)
+                enqueue(cert, 'admin', 'status_change')
                 logger.info(f"Certificate {cert.full_certificate_number} status changed to expired")
                 
         except Exception as e:
             logger.error(f"Error processing certificate {cert.full_certificate_number}: {str(e)}")
             continue
 
-    logger.info(f"Total notifications sent: {notifications_sent}")
-    return notifications_sent
\ No newline at end of file
+    # Ключ дедупликации не дает повторно поставить в очередь письмо за тот же день
+    existing = set(
+        NotificationOutbox.objects.filter(dedup_key__in=rows.keys()).values_list('dedup_key', flat=True)
+    )
+    new_rows = [row for key, row in rows.items() if key not in existing]
+    NotificationOutbox.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+    logger.info(f"Notifications enqueued: {len(new_rows)} (already queued: {len(existing)})")
+    return len(new_rows)
+
+def build_admin_digest(admin_email, today):
+    """
+    Собирает все ожидающие сводки события администратора в одно письмо.
+
+    События группируются по типу уведомления и стандарту ИСО. Возвращает число
+    событий, вошедших в сводку; сводка ставится в очередь как обычное уведомление.
+    """
+    with transaction.atomic():
+        events = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status='digest')
+            .select_related('certificate__iso_standard')
+            .order_by('pk')
+        )
+        if not events:
+            return 0
+
+        grouped = defaultdict(lambda: defaultdict(list))
+        for event in events:
+            cert = event.certificate
+            standard = str(cert.iso_standard) if cert else 'Сертификат удален'
+            grouped[event.notification_type][standard].append(event)
+
+        lines = [f"Сводка уведомлений о сертификатах за {today.strftime('%d.%m.%Y')}", ""]
+        for notification_type, standards in grouped.items():
+            count = sum(len(items) for items in standards.values())
+            lines.append(f"{NOTIFICATION_TYPE_LABELS.get(notification_type, notification_type)} ({count}):")
+            for standard, items in sorted(standards.items()):
+                lines.append(f"  {standard}:")
+                for event in items:
+                    cert = event.certificate
+                    if cert is None:
+                        lines.append(f"    - {event.subject}")
+                        continue
+                    inspections = ', '.join(
+                        d.strftime('%d.%m.%Y') for d in (cert.first_inspection_date, cert.second_inspection_date) if d
+                    )
+                    lines.append(
+                        f"    - {cert.full_certificate_number} — {cert.name}, ИНН {cert.inn}, "
+                        f"действует до {cert.expiry_date.strftime('%d.%m.%Y')}"
+                        + (f", инспекции: {inspections}" if notification_type == 'inspection_reminder' else '')
+                    )
+            lines.append("")
+        lines.append("С уважением,")
+        lines.append("Система управления сертификатами")
+
+        NotificationOutbox.objects.create(
+            recipient_type='admin', notification_type='admin_digest',
+            from_email=admin_email, recipient=admin_email,
+            subject=f"Сводка уведомлений о сертификатах за {today.strftime('%d.%m.%Y')}: {len(events)}",
+            body="\n".join(lines),
+            # Первое событие сводки однозначно определяет набор, поэтому повторная сборка не дублирует письмо
+            dedup_key=f"{today.isoformat()}:admin_digest:{admin_email}:{events[0].pk}",
+        )
+        NotificationOutbox.objects.filter(pk__in=[event.pk for event in events]).update(status='digested')
+
+    logger.info(f"Admin digest enqueued with {len(events)} events")
+    return len(events)
+
+def send_mass_notifications(admin_email, today, queryset=None):
+    """Ставит уведомления в очередь и сразу отправляет все накопившиеся"""
+    enqueue_notifications(admin_email, today, queryset)
+    build_admin_digest(admin_email, today)
+    return deliver_outbox()
@@ -2,49 +2,99 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse, FileResponse
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.db import router
 from django.db.models import Q
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.contrib import messages
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from .models import Certificate, ISOStandard, Auditor
 from .tasks import send_notifications_task
+from .statuses import refresh_statuses
+from .db_router import replica_read
+from .storage import is_content_addressed, file_response
+from .page_cache import cached_detail_page
+from .documents import document_file
+from .thumbnails import source_name, generate_thumbnails, is_image
+from .resize import FORMATS as RESIZE_FORMATS, ResizeError, output_format, get_resized
 from .forms import CertificateForm, AuditorFormSet
 from .utils import generate_certificate_image, generate_permission_image, generate_audit_image
+import hashlib
 import os
 from django.http import HttpResponse, Http404
 from django.conf import settings
 from django.views.static import serve
 from django.contrib.auth.decorators import login_required
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _generate_missing_thumbnail(path):
+    """Создает превью при первом запросе, если исходное изображение существует"""
+    source = source_name(path)
+    if source is None or not default_storage.exists(source):
+        return False
+    try:
+        generate_thumbnails(source)
+    except Exception as e:
+        logger.warning(f"Не удалось создать превью {path}: {e}")
+        return False
+    return default_storage.exists(path)
 
 @login_required
 def protected_media(request, path):
     """
     Защищенное обслуживание медиа файлов
     """
-    import os
-    from django.http import Http404, FileResponse
-    
     # Проверяем, что путь безопасен (предотвращаем directory traversal атаки)
     if '..' in path or path.startswith('/'):
         raise Http404("Недопустимый путь к файлу")
-    
-    # Полный путь к файлу
-    file_path = os.path.join(settings.MEDIA_ROOT, path)
-    
-    # Проверяем, что файл существует и находится в MEDIA_ROOT
-    if not os.path.exists(file_path) or not os.path.commonpath([settings.MEDIA_ROOT, file_path]) == settings.MEDIA_ROOT:
+
+    if not default_storage.exists(path) and not _generate_missing_thumbnail(path):
         raise Http404("Файл не найден")
-    
+
     try:
-        # Используем FileResponse для лучшей производительности
-        return FileResponse(open(file_path, 'rb'))
+        response = file_response(default_storage, path)
     except (IOError, OSError):
-        raise Http404("Ошибка при чтении файла")    
+        raise Http404("Ошибка при чтении файла")
+    if is_content_addressed(source_name(path) or path):
+        # Содержимое по такому адресу никогда не меняется
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@login_required
+def resized_media(request, width, path):
+    """
+    Изображение из медиа, уменьшенное до ширины width.
+
+    Доступ проверяется так же, как в protected_media. Уменьшенная копия
+    создается один раз и дальше отдается из дискового кэша (см. certificates.resize).
+    """
+    if '..' in path or path.startswith('/'):
+        raise Http404("Недопустимый путь к файлу")
+    if not is_image(path) or not default_storage.exists(path):
+        raise Http404("Файл не найден")
+
+    width = min(max(width, 16), getattr(settings, 'RESIZE_MAX_WIDTH', 2400))
+    fmt = output_format(path, request.headers.get('Accept', ''))
+    try:
+        cached = get_resized(path, width, fmt)
+        response = FileResponse(open(cached, 'rb'), content_type=RESIZE_FORMATS[fmt][1])
+    except (IOError, OSError, ResizeError) as e:
+        logger.warning(f"Не удалось уменьшить {path} до {width}: {e}")
+        raise Http404("Ошибка при чтении файла")
+    response['Vary'] = 'Accept'
+    if is_content_addressed(path):
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 def delete_certificate(request, certificate_id):
     certificate = get_object_or_404(Certificate, id=certificate_id)
     
     if request.method == 'POST':
-        certificate.delete()  # Используем метод delete модели, который уже обрабатывает удаление файлов
+        certificate.delete()  # Файлы сертификата и аудиторов удалит фоновая очистка медиа
         messages.success(request, 'Сертификат успешно удален.')
         return redirect('admin_certificates')
     
@@ -57,10 +107,8 @@ def generate_audit_preview(request, certificate_id, auditor_id):
     auditor = get_object_or_404(Auditor, id=auditor_id, certificate=certificate)
     
     if not auditor.audit_number:
-        iso_code = certificate.iso_standard.certificate_number_prefix
-        auditor_index = list(certificate.auditors.all()).index(auditor) + 1
-        auditor.audit_number = f"№AUD.{auditor_index:02d}.{iso_code}"
-        auditor.save()
+        auditor.audit_number = certificate.generate_audit_number()
+        auditor.save(update_fields=['audit_number'])
 
     image = generate_audit_image(certificate, auditor, auditor.audit_number)
     
@@ -79,6 +127,7 @@ def add_certificate(request):
             
             # Сохраняем аудиторов
             auditors = formset.save(commit=False)
+            certificate.assign_audit_numbers(auditors)
             for auditor in auditors:
                 auditor.certificate = certificate
                 auditor.save()
@@ -99,6 +148,25 @@ def add_certificate(request):
 def index(request):
     return render(request, 'certificates/index.html')
 
+def search_certificates(search_query):
+    """
+    Выборка публичного поиска по номеру сертификата (без знака №).
+
+    Полный номер (SMK.01234.xxx) и номер целиком (5 символов) ищутся точным
+    совпадением по уникальному индексу certificate_number_part; более короткий
+    ввод - как часть номера.
+    """
+    parts = search_query.split('.')
+    if len(parts) == 3 and parts[0].upper() == 'SMK':
+        query = Q(certificate_number_part=parts[1].upper())
+    elif len(search_query) == Certificate._meta.get_field('certificate_number_part').max_length:
+        # Номер не длиннее поля, поэтому вхождение такой длины - это совпадение целиком
+        query = Q(certificate_number_part=search_query.upper())
+    else:
+        query = Q(certificate_number_part__icontains=search_query)
+    return Certificate.objects.filter(query).select_related('iso_standard').prefetch_related('auditors')
+
+@replica_read
 def search_results(request):
     search_query = request.GET.get('search_query', '').strip()
     
@@ -106,22 +174,13 @@ def search_results(request):
         if search_query.startswith('№'):
             search_query = search_query[1:]
         
-        parts = search_query.split('.')
-        
-        query = Q()
-        
-        if len(parts) == 3 and parts[0].upper() == 'SMK':
-            query |= Q(certificate_number_part__iexact=parts[1])
-        else:
-            query |= Q(certificate_number_part__icontains=search_query)
+        certificates = search_certificates(search_query)
         
-        certificates = Certificate.objects.filter(query)
-        
-        for certificate in certificates:
-            current_status = certificate.calculate_status()
-            if certificate.status != current_status:
-                certificate.status = current_status
-                certificate.save(update_fields=['status'])
+        # Пересчитываем статусы только у найденных сертификатов с наступившей датой смены статуса
+        counts = refresh_statuses(queryset=certificates)
+        if any(counts.values()):
+            # Реплика еще не получила новые статусы
+            certificates = certificates.using(router.db_for_write(Certificate))
     else:
         certificates = Certificate.objects.none()
     
@@ -134,32 +193,66 @@ def trigger_notifications(request):
     send_notifications_task.delay()
     return HttpResponse("Notifications task triggered")
 
+@replica_read
 def certificate_detail(request, certificate_id):
-    certificate = get_object_or_404(Certificate, id=certificate_id)
-    qr_code_url = request.build_absolute_uri(reverse('certificate_detail', args=[certificate_id]))
-    
+    certificate = get_object_or_404(Certificate.objects.select_related('iso_standard'), id=certificate_id)
     context = {
         'certificate': certificate,
-        'qr_code_url': qr_code_url,
     }
-    return render(request, 'certificates/certificate_template.html', context)
+    return cached_detail_page(request, 'certificate', 'certificates/certificate_template.html', context, certificate)
 
+@replica_read
 def permission_detail(request, certificate_id):
-    certificate = get_object_or_404(Certificate, id=certificate_id)
+    certificate = get_object_or_404(Certificate.objects.select_related('iso_standard'), id=certificate_id)
     context = {
         'certificate': certificate,
     }
-    return render(request, 'certificates/permission_template.html', context)
+    return cached_detail_page(request, 'permission', 'certificates/permission_template.html', context, certificate)
 
+@replica_read
 def audit_detail(request, certificate_id, auditor_id):
-    certificate = get_object_or_404(Certificate, id=certificate_id)
+    certificate = get_object_or_404(Certificate.objects.select_related('iso_standard'), id=certificate_id)
     auditor = get_object_or_404(Auditor, id=auditor_id, certificate=certificate)
     context = {
         'certificate': certificate,
         'auditor': auditor,
     }
-    return render(request, 'certificates/audit_template.html', context)
+    return cached_detail_page(request, 'audit', 'certificates/audit_template.html', context, certificate, auditor)
+
+def _document_image_response(request, kind, certificate, auditor=None):
+    file = document_file(kind, certificate, auditor)
+    if file is None:
+        raise Http404("Документ еще не создан")
+    # Замененный документ сохраняется под другим именем, поэтому имя файла служит версией
+    etag = quote_etag(hashlib.sha256(file.name.encode()).hexdigest()[:32])
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            response = file_response(file.storage, file.name)
+        except (IOError, OSError):
+            raise Http404("Ошибка при чтении файла")
+    response['ETag'] = etag
+    # Браузер переспрашивает сервер и после изменения документа получает новое изображение
+    response['Cache-Control'] = 'public, no-cache'
+    return response
 
+@replica_read
+def certificate_image(request, certificate_id):
+    certificate = get_object_or_404(Certificate.objects.select_related('iso_standard'), id=certificate_id)
+    return _document_image_response(request, 'certificate', certificate)
+
+@replica_read
+def permission_image(request, certificate_id):
+    certificate = get_object_or_404(Certificate.objects.select_related('iso_standard'), id=certificate_id)
+    return _document_image_response(request, 'permission', certificate)
+
+@replica_read
+def audit_image(request, certificate_id, auditor_id):
+    certificate = get_object_or_404(Certificate.objects.select_related('iso_standard'), id=certificate_id)
+    auditor = get_object_or_404(Auditor, id=auditor_id, certificate=certificate)
+    return _document_image_response(request, 'audit', certificate, auditor)
+
+@replica_read
 def download_file(request, certificate_id, file_num):
     certificate = get_object_or_404(Certificate, id=certificate_id)
     
@@ -173,18 +266,13 @@ def download_file(request, certificate_id, file_num):
     if not file:
         return HttpResponse("Файл не найден", status=404)
     
-    response = FileResponse(file.open(), as_attachment=True, filename=file.name.split('/')[-1])
-    return response
+    return file_response(file.storage, file.name, as_attachment=True)
 
 @login_required
 def admin_certificates(request):
     certificates = Certificate.objects.all().order_by('-created_at')
     
-    for certificate in certificates:
-        current_status = certificate.calculate_status()
-        if certificate.status != current_status:
-            certificate.status = current_status
-            certificate.save(update_fields=['status'])
+    refresh_statuses(queryset=certificates)
     
     return render(request, 'certificates/admin/certificate_list.html', {
         'certificates': certificates
@@ -258,6 +346,7 @@ def edit_certificate(request, certificate_id=None):
             
             # Обработка аудиторов
             auditors = formset.save(commit=False)
+            certificate.assign_audit_numbers([auditor for auditor in auditors if not auditor.pk])
             for auditor in auditors:
                 if not auditor.pk:  # Если это новый аудитор
                     auditor.certificate = certificate
@@ -305,7 +394,7 @@ def delete_certificate_file(request, certificate_id):
         if file_field in ['file1', 'file2', 'file3']:
             file_obj = getattr(certificate, file_field)
             if file_obj:
-                file_obj.delete()
+                certificate._delete_file_if_exists(file_obj)
                 setattr(certificate, file_field, None)
                 certificate.save()
                 messages.success(request, f'Файл {file_field} успешно удален.')
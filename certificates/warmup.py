@@ -0,0 +1,151 @@
+"""
+Прогрев кэшей после деплоя.
+
+Вызывается из хуков gunicorn при старте сервиса (gunicorn.conf.py) или командой
+warm_caches. В build.sh прогрев не выполняется: при сборке постоянный диск
+с медиа не подключен, а кэш процесса сборки теряется.
+
+Фазы templates и psd заполняют кэши текущего процесса (post_worker_init),
+qr, thumbnails и pages - хранилище и общий кэш Django (имеет смысл при Redis,
+см. CACHES); их запускает when_ready отдельным процессом.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import reverse
+from .models import Certificate, Auditor
+from .thumbnails import generate_thumbnails_for
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PHASES = ['templates', 'psd', 'qr', 'thumbnails', 'pages']
+
+PUBLIC_TEMPLATES = [
+    'certificates/index.html',
+    'certificates/search_results.html',
+    'certificates/certificate_template.html',
+    'certificates/permission_template.html',
+    'certificates/audit_template.html',
+]
+
+
+def warmup_host():
+    if getattr(settings, 'WARMUP_HOST', None):
+        return settings.WARMUP_HOST
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def _in_parallel(function, items, workers):
+    """Обрабатывает элементы частями в нескольких потоках; каждый поток закрывает свои соединения с БД"""
+    if not items:
+        return 0
+    workers = max(1, min(workers, len(items)))
+    chunks = [items[index::workers] for index in range(workers)]
+
+    def run(chunk):
+        try:
+            return sum(1 for item in chunk if function(item))
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(run, chunks))
+
+
+def warm_templates():
+    for name in PUBLIC_TEMPLATES:
+        get_template(name)
+    return len(PUBLIC_TEMPLATES)
+
+
+def warm_psd_templates():
+    # Импорт модуля генерации сам по себе холодная стоимость: psd_tools, Pillow, NumPy
+    from .rendering import PSD_TEMPLATES, load_psd_template
+    return sum(1 for filename in PSD_TEMPLATES if load_psd_template(filename) is not None)
+
+
+def _generate_qr_code(certificate):
+    if not certificate._generate_qr_code():
+        return False
+    Certificate.objects.filter(pk=certificate.pk).update(qr_code=certificate.qr_code.name)
+    return True
+
+
+def warm_qr_codes(certificates, workers):
+    """Генерирует недостающие QR-коды действующих сертификатов"""
+    missing = [certificate for certificate in certificates if not certificate.qr_code]
+    return _in_parallel(_generate_qr_code, missing, workers)
+
+
+def warm_thumbnails(certificates, workers):
+    """Создает недостающие превью изображений действующих сертификатов и их аудиторов"""
+    instances = list(certificates) + list(Auditor.objects.filter(certificate__in=certificates))
+    return _in_parallel(lambda instance: generate_thumbnails_for([instance]), instances, workers)
+
+
+def warm_detail_pages(certificates, workers, host=None):
+    """Рендерит публичные страницы действующих сертификатов и их аудиторов в кэш"""
+    from . import views
+
+    factory = RequestFactory(HTTP_HOST=host or warmup_host())
+    secure = getattr(settings, 'SECURE_SSL_REDIRECT', False)
+    auditors = {}
+    for auditor in Auditor.objects.filter(certificate__in=certificates).only('pk', 'certificate_id'):
+        auditors.setdefault(auditor.certificate_id, []).append(auditor.pk)
+
+    pages = []
+    for certificate in certificates:
+        pages.append((views.certificate_detail, 'certificate_detail', [certificate.pk]))
+        pages.append((views.permission_detail, 'permission_detail', [certificate.pk]))
+        for auditor_id in auditors.get(certificate.pk, []):
+            pages.append((views.audit_detail, 'audit_detail', [certificate.pk, auditor_id]))
+
+    def render_page(page):
+        view, url_name, args = page
+        path = reverse(url_name, args=args)
+        try:
+            return view(factory.get(path, secure=secure), *args).status_code == 200
+        except Exception as e:
+            # Одна сломанная страница не должна останавливать прогрев остальных
+            logger.warning(f"Не удалось прогреть {path}: {e}")
+            return False
+
+    return _in_parallel(render_page, pages, workers)
+
+
+def warm_caches(phases=None, workers=4, limit=None, host=None):
+    """
+    Выполняет фазы прогрева по порядку.
+
+    limit ограничивает число действующих сертификатов (последние измененные первыми).
+    Возвращает список (фаза, количество, секунды).
+    """
+    phases = phases or PHASES
+    certificates = None
+    report = []
+    for phase in PHASES:
+        if phase not in phases:
+            continue
+        started = time.perf_counter()
+        if phase in ('qr', 'thumbnails', 'pages') and certificates is None:
+            queryset = Certificate.objects.filter(status='active').order_by('-updated_at')
+            certificates = list(queryset[:limit] if limit else queryset)
+        if phase == 'templates':
+            count = warm_templates()
+        elif phase == 'psd':
+            count = warm_psd_templates()
+        elif phase == 'qr':
+            count = warm_qr_codes(certificates, workers)
+        elif phase == 'thumbnails':
+            count = warm_thumbnails(certificates, workers)
+        else:
+            count = warm_detail_pages(certificates, workers, host)
+        seconds = time.perf_counter() - started
+        logger.info(f"Прогрев {phase}: {count} за {seconds:.2f} с")
+        report.append((phase, count, seconds))
+    return report
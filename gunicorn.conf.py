@@ -0,0 +1,33 @@
+"""
+Хуки gunicorn (файл подхватывается автоматически из каталога запуска).
+
+Кэши прогреваются при старте сервиса, а не в build.sh: при сборке на Render
+постоянный диск с медиа не подключен, а кэш в памяти процесса сборки теряется.
+Ошибки прогрева только пишутся в лог и не мешают запуску.
+"""
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def when_ready(server):
+    # QR-коды и превью пишутся в хранилище, страницы - в общий кэш (только при Redis).
+    # Отдельный процесс один раз на запуск: не задерживает воркеры и не роняет сервис
+    command = [sys.executable, os.path.join(BASE_DIR, 'manage.py'), 'warm_caches', '--phase', 'qr', '--phase', 'thumbnails']
+    if 'REDIS_URL' in os.environ:
+        command += ['--phase', 'pages']
+    try:
+        subprocess.Popen(command, cwd=BASE_DIR)
+    except OSError as e:
+        server.log.warning(f"Не удалось запустить прогрев кэшей: {e}")
+
+
+def post_worker_init(worker):
+    # Скомпилированные шаблоны и разобранные PSD-шаблоны хранятся в памяти каждого воркера
+    try:
+        from certificates.warmup import warm_caches
+        warm_caches(phases=['templates', 'psd'])
+    except Exception as e:
+        worker.log.warning(f"Прогрев воркера не выполнен: {e}")
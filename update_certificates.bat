@@ -1,3 +1,3 @@
 @echo off
 cd C:\cert_checker
-python manage.py update_certificate_statuses >> C:\cert_checker\logs\status_updates.log 2>&1
\ No newline at end of file
+python manage.py run_maintenance >> C:\cert_checker\logs\maintenance.log 2>&1
\ No newline at end of file